@@ -0,0 +1,68 @@
+# http://tools.qhex.org/
+#
+# Clue numbers for a line of cells, the lengths of the blocks of filled
+# cells in order, encoded as a deterministic automaton instead of with
+# running sums. The automaton reads the line one cell at a time, and
+# there is a BoolVar for each state it can be in after each cell, so
+# the model is linear in the length of the line and has no integer
+# arithmetic. The number of clasp rules added for clues is recorded in
+# the QHEX_STATS line.
+
+import claspy
+from claspy import *
+import gridstats
+
+def pattern(vals):
+    """The states of the automaton for the clue numbers vals: whether
+    each state has just read a filled cell. The line is read as if an
+    empty cell came before it, and each block is followed by an empty
+    cell."""
+    result = [False]
+    for b in vals:
+        if b > 0:
+            result += [True] * b + [False]
+    return result
+
+def step(states, i, filled):
+    """The state after reading a cell from state i, or None if the line
+    can not match."""
+    if not filled and not states[i]:
+        return i  # more empty cells between blocks
+    if i + 1 < len(states) and states[i + 1] == filled:
+        return i + 1
+    return None
+
+def matches(vals, line):
+    """Returns a BoolVar that is true when the cells of line, BoolVars
+    or constant bools, have blocks of filled cells of lengths vals."""
+    states = pattern(vals)
+    # the line may end after the last block or the empty cell after it
+    accept = [len(states) - 1] + ([len(states) - 2] if len(states) > 1 else [])
+    start = len(claspy.clasp_rules)
+    at = {0: BoolVar(True)}  # state -> whether the automaton is in it
+    count = 1
+    for pos, cell in enumerate(line):
+        left = len(line) - pos - 1
+        next_at = {}
+        for i, here in at.items():
+            for filled in (False, True):
+                if type(cell) is bool and cell != filled: continue
+                j = step(states, i, filled)
+                # skip states too far from the end to finish the line
+                if j is None or accept[-1] - j > left: continue
+                if type(cell) is not bool:
+                    here_filled = here & (cell if filled else ~cell)
+                else:
+                    here_filled = here
+                next_at[j] = next_at[j] | here_filled if j in next_at \
+                             else here_filled
+        at = next_at
+        count += len(at)
+    ends = [at[i] for i in accept if i in at]
+    result = reduce(lambda a,b: a|b, ends) if ends else BoolVar(False)
+    clues = gridstats.stats.setdefault('clues',
+                                       {'lines': 0, 'states': 0, 'rules': 0})
+    clues['lines'] += 1
+    clues['states'] += count
+    clues['rules'] += len(claspy.clasp_rules) - start
+    return result
@@ -0,0 +1,154 @@
+#!/usr/bin/python -u
+#
+# http://tools.qhex.org/
+#
+# Times the claspy solvers on the puzzles in bench/puzzles/<solver>/.
+#
+# usage: bench.py [--save] [--repeat N] [--timeout SECONDS] [--dlx] [--lazy]
+#                 [name ...]
+#
+# A name is a solver, like "nurikabe", or one puzzle, like
+# "nurikabe/20x20". For each puzzle this reports the size of the
+# model clasp is given, the time to the first solution, the time to
+# prove it unique (when it is), and the total time. The total is
+# compared with bench/baseline.json, which --save writes; each entry
+# records the flags it was run with.
+#
+# Each solver runs as a separate process, as gridpuzzle runs it, with
+# the solution cache turned off. --dlx runs the solvers that have one
+# with their dancing links backend, so that
+#
+#   bench.py --save sudoku shikaku polyominoes
+#   bench.py --dlx sudoku shikaku polyominoes
+#
+# compares it with clasp. --lazy likewise runs nurikabe, tapa and hitori
+# with lazy connectivity (see connectivity.py).
+
+import sys
+import os
+import time
+import json
+import signal
+import subprocess
+import threading
+
+here = os.path.dirname(os.path.abspath(__file__))
+root = os.path.dirname(here)
+BASELINE = os.path.join(here, 'baseline.json')
+TIMEOUT = 300
+
+def puzzles(names):
+    """Returns the names of the puzzles to run, like 'sudoku/9x9-hard'."""
+    result = []
+    base = os.path.join(here, 'puzzles')
+    for solver in sorted(os.listdir(base)):
+        for f in sorted(os.listdir(os.path.join(base, solver))):
+            name = solver + '/' + f.rsplit('.', 1)[0]
+            if not names or solver in names or name in names:
+                result.append(name)
+    return result
+
+def run(name, timeout, flags=()):
+    """Runs one puzzle, passing the solver flags. Returns a dict of
+    its statistics."""
+    solver, puzzle = name.split('/')
+    env = dict(os.environ)
+    env.pop('QHEX_CACHE', None)
+    env.pop('QHEX_SOLVERD', None)
+    env.pop('QHEX_DLX', None)  # --dlx decides
+    env.pop('QHEX_CONNECTIVITY', None)  # and --lazy
+    start = time.time()
+    p = subprocess.Popen([sys.executable, '-u',
+                          os.path.join(root, solver + '.py')] + list(flags),
+                         stdin=open(os.path.join(here, 'puzzles', solver,
+                                                 puzzle + '.txt')),
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         env=env, preexec_fn=os.setsid)
+    timer = threading.Timer(timeout, os.killpg, (p.pid, signal.SIGKILL))
+    timer.start()
+    stats = {'vars': None, 'rules': None, 'first': None, 'unique': None,
+             'solutions': 0}
+    for line in iter(p.stdout.readline, ''):
+        now = time.time() - start
+        if line.startswith('Solving') and stats['vars'] is None:
+            # Solving <n> variables, <m> rules
+            words = line.split()
+            stats['vars'], stats['rules'] = int(words[1]), int(words[3])
+        elif line.startswith('Solution ') and line.strip().endswith(':'):
+            stats['solutions'] += 1
+            if stats['first'] is None:
+                stats['first'] = now
+        elif line.startswith('Too many solutions'):
+            stats['solutions'] = str(stats['solutions']) + '+'
+    errors = p.stderr.read()
+    status = p.wait()
+    timer.cancel()
+    stats['total'] = time.time() - start
+    if status == -signal.SIGKILL:
+        stats['error'] = 'timed out'
+    elif status != 0 or errors:
+        stats['error'] = (errors.strip().split('\n') or ['failed'])[-1]
+    elif stats['solutions'] == 1:
+        stats['unique'] = stats['total']
+    return stats
+
+def best(runs):
+    """Combines repeated runs, keeping the fastest times."""
+    stats = runs[0]
+    for key in ('first', 'unique', 'total'):
+        times = [s[key] for s in runs if s[key] is not None]
+        stats[key] = min(times) if times else None
+    return stats
+
+def fmt(x):
+    if x is None: return '-'
+    if type(x) is float: return '%.2f' % x
+    return str(x)
+
+def main():
+    args = sys.argv[1:]
+    save = '--save' in args
+    flags = [arg for arg in args if arg in ('--dlx', '--lazy')]
+    repeat = 1
+    timeout = TIMEOUT
+    names = []
+    while args:
+        arg = args.pop(0)
+        if arg == '--repeat':
+            repeat = int(args.pop(0))
+        elif arg == '--timeout':
+            timeout = float(args.pop(0))
+        elif arg not in ('--save', '--dlx', '--lazy'):
+            names.append(arg)
+    baseline = {}
+    if os.path.exists(BASELINE):
+        baseline = json.load(open(BASELINE))
+    header = ['puzzle', 'vars', 'rules', 'solns', 'first', 'unique',
+              'total', 'baseline', 'ratio']
+    print ' '.join(h.rjust(8) if i else h.ljust(36)
+                   for i, h in enumerate(header))
+    results = {}
+    for name in puzzles(names):
+        stats = best([run(name, timeout, flags) for i in range(repeat)])
+        stats['flags'] = flags
+        results[name] = stats
+        old = baseline.get(name, {}).get('total')
+        ratio = None
+        if old and 'error' not in stats:
+            ratio = '%.2fx' % (stats['total'] / old)
+        row = [stats['vars'], stats['rules'], stats['solutions'],
+               stats['first'], stats['unique'], stats['total'], old, ratio]
+        line = name.ljust(36) + ' ' + ' '.join(fmt(x).rjust(8) for x in row)
+        if 'error' in stats:
+            line += '  ' + stats['error']
+        print line
+    if save:
+        baseline.update(results)
+        f = open(BASELINE, 'w')
+        json.dump(baseline, f, indent=1, sort_keys=True)
+        f.write('\n')
+        f.close()
+        print 'saved', BASELINE
+
+if __name__ == '__main__':
+    main()
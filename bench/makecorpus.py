@@ -0,0 +1,568 @@
+#!/usr/bin/python
+#
+# http://tools.qhex.org/
+#
+# Writes the benchmark corpus in bench/puzzles/<solver>/. Each puzzle
+# is made from a random solution, so it is solvable. The sudoku and
+# shikaku puzzles are also checked with dancing links to have just
+# that solution, so the bench times how long the solvers take to prove
+# it unique; the others may have more than one. The seed is fixed, so
+# the corpus is the same every time.
+
+import sys
+import os
+import random
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(here))
+import exactcover
+
+def nrange(*dim_sizes):
+    """Returns an iterator of all coordinates within the given dimensions."""
+    if len(dim_sizes) == 1:
+        for i in range(dim_sizes[0]):
+            yield (i,)
+        return
+    for i in range(dim_sizes[0]):
+        for rest in apply(nrange, dim_sizes[1:]):
+            yield (i,) + rest
+
+def neighbors(r, c, height, width):
+    for r1, c1 in ((r-1,c), (r+1,c), (r,c-1), (r,c+1)):
+        if r1 >= 0 and r1 < height and c1 >= 0 and c1 < width:
+            yield r1, c1
+
+def ring(r, c):
+    """The 8 cells around (r,c), clockwise from the top left."""
+    return [(r-1,c-1), (r-1,c), (r-1,c+1), (r,c+1),
+            (r+1,c+1), (r+1,c), (r+1,c-1), (r,c-1)]
+
+def connected(cells):
+    """Whether a set of cells is orthogonally connected."""
+    if not cells: return True
+    start = iter(cells).next()
+    seen = set([start])
+    todo = [start]
+    while todo:
+        r, c = todo.pop()
+        for cell in ((r-1,c), (r+1,c), (r,c-1), (r,c+1)):
+            if cell in cells and cell not in seen:
+                seen.add(cell)
+                todo.append(cell)
+    return len(seen) == len(cells)
+
+def has_pool(cells, r, c):
+    """Whether (r,c) is part of a 2x2 block of cells."""
+    for dr, dc in nrange(2, 2):
+        if all((r-dr+i, c-dc+j) in cells for i, j in nrange(2, 2)):
+            return True
+    return False
+
+def grid_text(grid):
+    return '\n'.join(' '.join(map(str, row)) for row in grid) + '\n'
+
+################################################################################
+# puzzle generators
+
+def sudoku_cover(grid, b):
+    """The sudoku as an exact cover, as in sudoku.cover()."""
+    n = b*b
+    x = exactcover.ExactCover(
+        [('cell', r, c) for r, c in nrange(n, n)] +
+        [(unit, i, v) for unit in ('row', 'col', 'box')
+         for i in range(n) for v in range(1, n+1)])
+    for r, c in nrange(n, n):
+        for v in range(1, n+1):
+            if grid[r][c] in ('`', str(v)):
+                x.add_row((r, c, v), [('cell', r, c), ('row', r, v),
+                                      ('col', c, v),
+                                      ('box', r // b * b + c // b, v)])
+    return x
+
+def sudoku(holes, b=3):
+    """A sudoku with up to holes cells blank, fewer if removing any
+    more givens would leave it without a unique solution."""
+    n = b*b
+    base = [[(b*(r%b) + r//b + c) % n + 1 for c in range(n)] for r in range(n)]
+    digits = range(1, n+1)
+    random.shuffle(digits)
+    bands = random.sample(range(b), b)
+    rows = [i*b + r for i in bands for r in random.sample(range(b), b)]
+    stacks = random.sample(range(b), b)
+    cols = [s*b + c for s in stacks for c in random.sample(range(b), b)]
+    grid = [[str(digits[base[r][c] - 1]) for c in cols] for r in rows]
+    # the cells chosen at random first, then the rest in order
+    cells = random.sample(list(nrange(n, n)), holes)
+    for r, c in cells + sorted(set(nrange(n, n)) - set(cells)):
+        if holes == 0: break
+        given, grid[r][c] = grid[r][c], '`'
+        if sudoku_cover(grid, b).count(limit=2) == 1:
+            holes -= 1
+        else:
+            grid[r][c] = given
+    return grid_text(grid)
+
+def nurikabe(height, width, max_size=8):
+    # start from one-cell islands on a lattice, which leaves no 2x2
+    # pools of wall, then grow and merge them
+    island = {}  # cell -> island number
+    members = {}
+    for r, c in nrange(height, width):
+        if r % 2 and c % 2:
+            island[(r,c)] = len(members)
+            members[len(members)] = [(r,c)]
+    wall = set(nrange(height, width)) - set(island)
+    for step in range(height * width):
+        r, c = random.choice(list(wall))
+        ids = set(island[n] for n in neighbors(r, c, height, width)
+                  if n in island)
+        if not ids or 1 + sum(len(members[i]) for i in ids) > max_size:
+            continue
+        wall.remove((r,c))
+        if not connected(wall):
+            wall.add((r,c))
+            continue
+        i = ids.pop()
+        island[(r,c)] = i
+        members[i].append((r,c))
+        for j in ids:
+            for cell in members.pop(j):
+                island[cell] = i
+                members[i].append(cell)
+    grid = [['`'] * width for r in range(height)]
+    for i, cells in members.items():
+        r, c = random.choice(cells)
+        grid[r][c] = len(cells)
+    return grid_text(grid)
+
+def paintbynumbers(height, width, density=0.55):
+    image = [[random.random() < density for c in range(width)]
+             for r in range(height)]
+    def clue(line):
+        runs = []
+        count = 0
+        for x in line + [False]:
+            if x: count += 1
+            elif count:
+                runs.append(count)
+                count = 0
+        return ' '.join(map(str, runs or [0]))
+    across = [clue(row) for row in image]
+    down = [clue([row[c] for row in image]) for c in range(width)]
+    return '\n'.join(across) + '\n\n' + '\n'.join(down) + '\n'
+
+def mines(height, width, density):
+    return set(cell for cell in nrange(height, width)
+               if random.random() < density)
+
+def fillapix(height, width, reveal=0.6):
+    filled = mines(height, width, 0.45)
+    grid = [['`'] * width for r in range(height)]
+    for r, c in nrange(height, width):
+        if random.random() < reveal:
+            grid[r][c] = sum((r+i-1, c+j-1) in filled for i, j in nrange(3, 3))
+    return grid_text(grid)
+
+def minesweeper(height, width, reveal=0.5):
+    filled = mines(height, width, 0.2)
+    grid = [['`'] * width for r in range(height)]
+    for r, c in nrange(height, width):
+        if (r,c) not in filled and random.random() < reveal:
+            grid[r][c] = sum((r+i-1, c+j-1) in filled
+                             for i, j in nrange(3, 3) if (i,j) != (1,1))
+    return grid_text(grid)
+
+def lightsout(height, width):
+    lit = set()
+    for r, c in mines(height, width, 0.3):
+        for cell in [(r,c)] + list(neighbors(r, c, height, width)):
+            lit ^= set([cell])
+    return grid_text([['#' if (r,c) in lit else '`' for c in range(width)]
+                      for r in range(height)])
+
+def hitori(size):
+    order = random.sample(range(1, size+1), size)
+    rows = random.sample(range(size), size)
+    cols = random.sample(range(size), size)
+    grid = [[order[(r + c) % size] for c in cols] for r in rows]
+    shaded = set()
+    for r, c in random.sample(list(nrange(size, size)), size*size // 4):
+        if any(n in shaded for n in neighbors(r, c, size, size)): continue
+        shaded.add((r,c))
+        if not connected(set(nrange(size, size)) - shaded):
+            shaded.remove((r,c))
+    for r, c in shaded:  # copy a number from elsewhere in the row
+        grid[r][c] = grid[r][random.choice([c1 for c1 in range(size) if c1 != c])]
+    return grid_text(grid)
+
+def kakuro(height, width, density=0.25):
+    black = set((r,c) for r, c in nrange(height, width)
+                if r == 0 or c == 0 or random.random() < density)
+    # break up runs longer than 9 cells
+    for r, c in nrange(height, width):
+        if c >= 10 and all((r,c1) not in black for c1 in range(c-9, c+1)):
+            black.add((r,c))
+        if r >= 10 and all((r1,c) not in black for r1 in range(r-9, r+1)):
+            black.add((r,c))
+    white = [cell for cell in nrange(height, width) if cell not in black]
+    def run(r, c, dr, dc):
+        while (r-dr, c-dc) not in black: r, c = r-dr, c-dc
+        cells = []
+        while r < height and c < width and (r,c) not in black:
+            cells.append((r,c))
+            r, c = r+dr, c+dc
+        return cells
+    runs = dict((cell, (run(cell[0], cell[1], 0, 1), run(cell[0], cell[1], 1, 0)))
+                for cell in white)
+    digit = {}
+    def fill(i):
+        if i == len(white): return True
+        cell = white[i]
+        used = set(digit.get(x) for x in runs[cell][0] + runs[cell][1])
+        for d in random.sample(range(1, 10), 9):
+            if d not in used:
+                digit[cell] = d
+                if fill(i+1): return True
+                del digit[cell]
+        return False
+    if not fill(0):
+        return None
+    grid = [['`'] * width for r in range(height)]
+    for r, c in black:
+        down = [(r1,c) for r1 in range(r+1, height)]
+        right = [(r,c1) for c1 in range(c+1, width)]
+        def total(cells):
+            s = 0
+            for cell in cells:
+                if cell in black: break
+                s += digit[cell]
+            return str(s) if s else ''
+        grid[r][c] = total(down) + '\\' + total(right)
+    return grid_text(grid)
+
+def shikaku(height, width, max_area=12):
+    rects = []
+    def split(r1, c1, r2, c2):
+        h, w = r2-r1, c2-c1
+        if h*w <= max_area and (h*w <= 2 or random.random() < 0.5):
+            rects.append((r1, c1, r2, c2))
+            return
+        if h > w or (h == w and random.random() < 0.5):
+            r = random.randint(r1+1, r2-1)
+            split(r1, c1, r, c2)
+            split(r, c1, r2, c2)
+        else:
+            c = random.randint(c1+1, c2-1)
+            split(r1, c1, r2, c)
+            split(r1, c, r2, c2)
+    split(0, 0, height, width)
+    clue = dict((rect, (random.randint(rect[0], rect[2]-1),
+                        random.randint(rect[1], rect[3]-1))) for rect in rects)
+    # moving clues draws from its own generator, so the puzzles after
+    # this one don't change
+    rng = random.Random(str(sorted(rects)))
+    for step in range(height * width):
+        # each rectangle of the right area around one clue, as in
+        # shikaku.rectangles()
+        at = dict((cell, rect) for rect, cell in clue.items())
+        x = exactcover.ExactCover(list(nrange(height, width)))
+        for (r, c), rect in at.items():
+            area = (rect[2]-rect[0]) * (rect[3]-rect[1])
+            for h in range(1, area+1):
+                if area % h: continue
+                w = area // h
+                for r1, c1 in nrange(r+1, c+1):
+                    if r1+h <= r or r1+h > height or c1+w <= c or c1+w > width:
+                        continue
+                    cells = list((r1+i, c1+j) for i, j in nrange(h, w))
+                    if all(cell not in at or cell == (r,c) for cell in cells):
+                        x.add_row((rect, (r1, c1, r1+h, c1+w)), cells)
+        solns = list(x.solutions(limit=2))
+        if len(solns) == 1:
+            break
+        # another rectangle for some clue: move the clue of a rectangle
+        # it overlaps into it
+        owner, other = rng.choice([(rect, alt) for soln in solns
+                                      for rect, alt in soln if rect != alt])
+        rect = rng.choice([rect for rect in rects if rect != owner and
+                              rect[0] < other[2] and other[0] < rect[2] and
+                              rect[1] < other[3] and other[1] < rect[3]])
+        clue[rect] = rng.choice(
+            [(r, c) for r, c in nrange(height, width)
+             if max(rect[0], other[0]) <= r < min(rect[2], other[2]) and
+             max(rect[1], other[1]) <= c < min(rect[3], other[3])])
+    else:
+        return None  # still not unique
+    grid = [['`'] * width for r in range(height)]
+    for (r1, c1, r2, c2), (r, c) in clue.items():
+        grid[r][c] = (r2-r1)*(c2-c1)
+    return grid_text(grid)
+
+def fillomino(height, width):
+    region = {}
+    cells = {}
+    for start in nrange(height, width):
+        if start in region: continue
+        i = len(cells)
+        region[start] = i
+        cells[i] = [start]
+        target = random.randint(1, 5)
+        while len(cells[i]) < target:
+            frontier = [n for cell in cells[i]
+                        for n in neighbors(cell[0], cell[1], height, width)
+                        if n not in region]
+            if not frontier: break
+            n = random.choice(frontier)
+            region[n] = i
+            cells[i].append(n)
+    # merge touching regions of the same size until there are none
+    merged = True
+    while merged:
+        merged = False
+        for r, c in nrange(height, width):
+            for n in neighbors(r, c, height, width):
+                i, j = region[(r,c)], region[n]
+                if i != j and len(cells[i]) == len(cells[j]):
+                    for cell in cells.pop(j):
+                        region[cell] = i
+                        cells[i].append(cell)
+                    merged = True
+    grid = [[len(cells[region[(r,c)]]) for c in range(width)]
+            for r in range(height)]
+    total = sum(map(sum, grid))
+    for r, c in random.sample(list(nrange(height, width)), height*width):
+        if total - grid[r][c] >= height*width:
+            total -= grid[r][c]
+            grid[r][c] = '`'
+    return grid_text(grid)
+
+def tapa(height, width, density=0.5):
+    start = (random.randrange(height), random.randrange(width))
+    shaded = set([start])
+    for step in range(height * width * 4):
+        if len(shaded) >= density * height * width: break
+        r, c = random.choice(list(shaded))
+        r, c = random.choice(list(neighbors(r, c, height, width)))
+        if (r,c) in shaded: continue
+        shaded.add((r,c))
+        if has_pool(shaded, r, c):
+            shaded.remove((r,c))
+    grid = [['`'] * width for r in range(height)]
+    for r, c in nrange(height, width):
+        if (r,c) in shaded or random.random() > 0.3: continue
+        around = [cell in shaded for cell in ring(r, c)]
+        if all(around): continue
+        i = around.index(False)
+        around = around[i:] + around[:i]  # start at a gap
+        runs = []
+        count = 0
+        for x in around + [False]:
+            if x: count += 1
+            elif count:
+                runs.append(count)
+                count = 0
+        grid[r][c] = ','.join(map(str, runs or [0]))
+    return grid_text(grid)
+
+def hashiwokakero(height, width, islands):
+    grid = [['`'] * width for r in range(height)]
+    used = set()  # cells covered by islands or bridges
+    count = {}
+    start = (random.randrange(height), random.randrange(width))
+    count[start] = 0
+    used.add(start)
+    for step in range(islands * 50):
+        if len(count) >= islands: break
+        r, c = random.choice(count.keys())
+        dr, dc = random.choice([(0,1), (0,-1), (1,0), (-1,0)])
+        length = random.randint(2, 5)
+        path = [(r+dr*i, c+dc*i) for i in range(1, length+1)]
+        r1, c1 = path[-1]
+        if r1 < 0 or r1 >= height or c1 < 0 or c1 >= width: continue
+        if any(cell in used for cell in path): continue
+        if any(n in count for n in neighbors(r1, c1, height, width)): continue
+        bridges = random.randint(1, 2)
+        for cell in path[:-1]:
+            used.add(cell)
+        used.add(path[-1])
+        count[path[-1]] = bridges
+        count[(r,c)] += bridges
+    for (r,c), n in count.items():
+        grid[r][c] = n
+    return grid_text(grid)
+
+def maysu(height, width, pearls=0.5):
+    # the loop runs around a simply connected set of squares, each
+    # square having four cell centers as its corners
+    def edges(squares):
+        result = {}
+        for r, c in squares:
+            for edge in (((r,c), (r,c+1)), ((r+1,c), (r+1,c+1)),
+                         ((r,c), (r+1,c)), ((r,c+1), (r+1,c+1))):
+                result[edge] = result.get(edge, 0) + 1
+        return [edge for edge, n in result.items() if n == 1]
+    def loop(squares):
+        """The cells of the boundary in order, or None if it is not a
+        simple loop."""
+        next_cells = {}
+        for a, b in edges(squares):
+            next_cells.setdefault(a, []).append(b)
+            next_cells.setdefault(b, []).append(a)
+        if any(len(x) != 2 for x in next_cells.values()): return None
+        start = min(next_cells)
+        path = [start, next_cells[start][0]]
+        while path[-1] != start:
+            a, b = next_cells[path[-1]]
+            path.append(a if a != path[-2] else b)
+        if len(path) - 1 != len(next_cells): return None
+        return path[:-1]
+    squares = set([(random.randrange(height-1), random.randrange(width-1))])
+    for step in range(height * width * 4):
+        if len(squares) >= (height-1) * (width-1) * 0.6: break
+        r, c = random.choice(list(squares))
+        r, c = random.choice(list(neighbors(r, c, height-1, width-1)))
+        if (r,c) in squares: continue
+        squares.add((r,c))
+        if loop(squares) is None:
+            squares.remove((r,c))
+    path = loop(squares)
+    n = len(path)
+    def turns(i):
+        a, b, c = path[i-1], path[i], path[(i+1) % n]
+        return a[0] != c[0] and a[1] != c[1]
+    grid = [['`'] * width for r in range(height)]
+    for i in range(n):
+        if random.random() > pearls: continue
+        r, c = path[i]
+        if turns(i) and not turns(i-1) and not turns((i+1) % n):
+            grid[r][c] = 'x'
+        if not turns(i) and (turns(i-1) or turns((i+1) % n)):
+            grid[r][c] = 'o'
+    return grid_text(grid)
+
+def thermometers(height, width):
+    therm = {}  # cell -> (thermometer id, position)
+    cells = {}
+    for start in random.sample(list(nrange(height, width)), height*width):
+        if start in therm: continue
+        i = len(cells)
+        dr, dc = random.choice([(0,1), (0,-1), (1,0), (-1,0)])
+        cells[i] = [start]
+        r, c = start
+        for k in range(random.randint(1, 4)):
+            r, c = r+dr, c+dc
+            if r < 0 or r >= height or c < 0 or c >= width: break
+            if (r,c) in therm or (r,c) in cells[i]: break
+            cells[i].append((r,c))
+        for k, cell in enumerate(cells[i]):
+            therm[cell] = i
+    arrow = {(0,1): '>', (0,-1): '<', (1,0): 'v', (-1,0): '^'}
+    grid = [['`'] * (width+1) for r in range(height+1)]
+    filled = set()
+    for i, path in cells.items():
+        level = random.randint(0, len(path))
+        filled.update(path[:level])
+        for k, (r, c) in enumerate(path):
+            if k == 0:
+                grid[r][c] = 'o'
+            else:
+                grid[r][c] = arrow[(r - path[k-1][0], c - path[k-1][1])]
+    for r in range(height):
+        grid[r][width] = sum((r,c) in filled for c in range(width))
+    for c in range(width):
+        grid[height][c] = sum((r,c) in filled for r in range(height))
+    return grid_text(grid)
+
+def numberlink(height, width, max_len=8):
+    snake = [(r, c if r % 2 == 0 else width-1-c)
+             for r in range(height) for c in range(width)]
+    paths = [[]]
+    for cell in snake:
+        path = paths[-1]
+        near = set(neighbors(cell[0], cell[1], height, width))
+        if path and (len(path) >= max_len or
+                     any(x in near for x in path[:-1]) or
+                     (len(path) >= 2 and random.random() < 0.2)):
+            paths.append([])
+        paths[-1].append(cell)
+    if len(paths[-1]) == 1:  # a path needs two ends
+        paths[-2].append(paths.pop()[0])
+    grid = [['`'] * width for r in range(height)]
+    for i, path in enumerate(paths):
+        for cell in (path[0], path[-1]):
+            grid[cell[0]][cell[1]] = i + 1
+    return grid_text(grid)
+
+def polyominoes(mode, board, pieces):
+    return mode + '\n' + '\n\n'.join([board] + pieces) + '\n'
+
+pentominoes = ['FF\n FF\n F', 'IIIII', 'LLLL\nL', 'NN\n NNN', 'PPP\nPP',
+               'TTT\n T\n T', 'U U\nUUU', 'VVV\nV\nV', 'W\nWW\n WW',
+               ' X\nXXX\n X', 'YYYY\n Y', 'ZZ\n Z\n ZZ']
+
+# the Soma cube pieces, in layers separated by lines of /
+soma = ['VV\nV', 'LLL\nL', 'TTT\n T', ' ZZ\nZZ', 'A\nAA\n/\nA',
+        'BB\n/\n B\n B', 'PP\nP\n/\nP']
+
+def board(height, width, holes=()):
+    return '\n'.join(''.join(' ' if (r,c) in holes else '#'
+                             for c in range(width)) for r in range(height))
+
+################################################################################
+
+def corpus():
+    yield 'sudoku', '9x9-easy', sudoku(40)
+    yield 'sudoku', '9x9-sparse', sudoku(58)
+    # from Arto Inkala, often called the hardest sudoku
+    yield 'sudoku', '9x9-hard', grid_text(
+        [['`' if x == '0' else x for x in row] for row in
+         ['800000000', '003600000', '070090200', '050007000', '000045700',
+          '000100030', '001000068', '008500010', '090000400']])
+    for size in (10, 20, 25):
+        yield 'nurikabe', '%dx%d' % (size, size), nurikabe(size, size)
+    for size in (10, 25, 40):
+        yield 'paintbynumbers', '%dx%d' % (size, size), paintbynumbers(size, size)
+    yield 'polyominoes', '6x10-pentominoes', \
+        polyominoes('reflection', board(6, 10), pentominoes)
+    yield 'polyominoes', '8x8-pentominoes', \
+        polyominoes('reflection', board(8, 8, [(3,3), (3,4), (4,3), (4,4)]),
+                    pentominoes)
+    yield 'polyominoes', '10x10-pentominoes-space', \
+        polyominoes('reflection', board(10, 10), pentominoes)
+    for size in (10, 20):
+        yield 'fillapix', '%dx%d' % (size, size), fillapix(size, size)
+        yield 'minesweeper', '%dx%d' % (size, size), minesweeper(size, size)
+        yield 'lightsout', '%dx%d' % (size, size), lightsout(size, size)
+        yield 'shikaku', '%dx%d' % (size, size), shikaku(size, size)
+        yield 'hashiwokakero', '%dx%d' % (size, size), \
+            hashiwokakero(size, size, size*size // 8)
+    for size in (8, 12):
+        yield 'hitori', '%dx%d' % (size, size), hitori(size)
+        yield 'kakuro', '%dx%d' % (size, size), kakuro(size, size)
+    for size in (10, 15):
+        yield 'fillomino', '%dx%d' % (size, size), fillomino(size, size)
+        yield 'tapa', '%dx%d' % (size, size), tapa(size, size)
+        yield 'maysu', '%dx%d' % (size, size), maysu(size, size)
+        yield 'numberlink', '%dx%d' % (size, size), numberlink(size, size)
+    for size in (6, 10):
+        yield 'thermometers', '%dx%d' % (size, size), thermometers(size, size)
+    yield 'sudoku', '4x4', sudoku(10, 2)
+    yield 'sudoku', '16x16', sudoku(150, 4)
+    # with more holes, checking uniqueness takes dancing links minutes
+    yield 'sudoku', '25x25', sudoku(300, 5)
+    yield 'polyominoes', '3x3x3-soma', \
+        polyominoes('rotation 3d', '\n/\n'.join([board(3, 3)] * 3), soma)
+    yield 'sudokubatch', '9x9-page', \
+        '---\n'.join(sudoku(random.randint(40, 56)) for i in range(200))
+
+if __name__ == '__main__':
+    random.seed(2014)
+    for solver, name, text in corpus():
+        if text is None:
+            continue  # the generator gave up
+        path = os.path.join(here, 'puzzles', solver)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        f = open(os.path.join(path, name + '.txt'), 'w')
+        f.write(text)
+        f.close()
@@ -4,9 +4,11 @@
 
 import sys
 import dictionary
+import jsonout
 
 MAX_WORD_LEN = 20
 
+jsonout.start()
 input = sys.stdin.read().strip().replace('\n',' ')
 
 def rot(s, n):
@@ -33,8 +35,12 @@ def highlight(s):
                     result[k] = '^'
     return ''.join(result)
 
+shifts = []
 for n in range(26):
     s = rot(input, n)
+    words = highlight(s)
     print ('+'+str(n)).rjust(3), ('-'+str((26-n)%26)).rjust(3), '', s
-    print '        ', highlight(s)
+    print '        ', words
+    shifts.append({'shift': n, 'text': s, 'words': words})
+jsonout.result('ok', shifts=shifts)
 
@@ -0,0 +1,92 @@
+# http://tools.qhex.org/
+#
+# Requires the filled (or the unfilled) cells of a grid of BoolVars to
+# be connected, for nurikabe, tapa and hitori.
+#
+# By default the model proves it up front, with an Atom for each cell
+# reached from a source cell. Given --lazy on the command line, or
+# QHEX_CONNECTIVITY=lazy, the model leaves it out: each solution clasp
+# finds is checked with a union-find, and if its region is split, a
+# cut is added for each piece but the largest and clasp runs again.
+# The cut says that if the piece and the rest of the region both have
+# a cell in the region, one of the cells around the piece must be in
+# it too. Nothing is printed differently; the rounds are counted under
+# 'cuts' in the QHEX_STATS line.
+
+import os
+import sys
+from claspy import *
+from gridinput import nrange, neighbor_tables
+
+def lazy():
+    return '--lazy' in sys.argv[1:] or \
+        os.environ.get('QHEX_CONNECTIVITY') == 'lazy'
+
+def in_region(var, filled):
+    return var if filled else ~var
+
+def require_connected(grid, g, filled=True, start=None):
+    """Requires the cells of grid that are filled, or unfilled if
+    filled is False, to be connected. g is the gridinput.Grid. start
+    lists cells one of which is known to be in the region; otherwise
+    the region is reached from any one cell. Does nothing in lazy mode,
+    where cuts() does the work."""
+    if lazy():
+        return
+    height, width = len(grid), len(grid[0])
+    proven = [[Atom() for c in range(width)] for r in range(height)]
+    if start is None:
+        source = MultiVar(*nrange(height, width))
+        for r,c in nrange(height, width):
+            proven[r][c].prove_if(source == (r,c))
+    else:
+        for r,c in start:
+            proven[r][c].prove_if(True)
+    for r,c in nrange(height, width):
+        for r1,c1 in g.orthogonal[r][c]:
+            proven[r][c].prove_if(in_region(grid[r1][c1], filled) &
+                                  proven[r1][c1])
+        require(cond(in_region(grid[r][c], filled), proven[r][c], True))
+
+def components(cells):
+    """Groups the cells into orthogonally connected pieces, with a
+    union-find."""
+    parent = dict((x, x) for x in cells)
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for r,c in cells:
+        for n in ((r+1,c), (r,c+1)):
+            if n in parent:
+                parent[find(n)] = find((r,c))
+    result = {}
+    for x in cells:
+        result.setdefault(find(x), []).append(x)
+    return sorted(result.values(), key=len, reverse=True)
+
+def cuts(filled=True):
+    """Returns the cuts for gridsolve.solve_puzzle() in lazy mode, for a
+    model whose solution variables are the grid passed to
+    require_connected(), or None in eager mode."""
+    if not lazy():
+        return None
+    def add_cuts(grid, soln):
+        height, width = len(grid), len(grid[0])
+        orthogonal = neighbor_tables(height, width)['orthogonal']
+        region = [(r,c) for r,c in nrange(height, width)
+                  if bool(soln[r][c]) == filled]
+        pieces = components(region)
+        rules = []
+        for piece in pieces[1:]:
+            inside = set(piece)
+            around = set(n for r,c in piece for n in orthogonal[r][c]
+                         if n not in inside)
+            rest = [x for x in region if x not in inside]
+            var = lambda (r, c): in_region(grid[r][c], filled)
+            rules.append(at_least(1, map(var, sorted(around))) |
+                         ~at_least(1, map(var, piece)) |
+                         ~at_least(1, map(var, rest)))
+        return rules
+    return add_cuts
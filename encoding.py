@@ -23,9 +23,11 @@ import sys
 import os
 import base64
 import re
+import jsonout
 
 CMUDICT = '../dict/cmudict.0.7a'  # relative to program location
 
+jsonout.start()
 input_str = sys.stdin.read().replace('\t',' ').strip()
 input_str = '\n'.join([line.strip() for line in input_str.split('\n')])
 
@@ -582,6 +584,7 @@ for enc_name, enc_f in encoders:
 
 if len(encoder_results) == 0:
     print 'no encodings found'
+    jsonout.result('ok', encodings=[])
     sys.exit()
 
 # sort by length and quality of result
@@ -593,6 +596,7 @@ encoder_results.sort(key=lambda (n,r): result_score(r))
 
 printed_scores = {}  # name -> score
 printed_results = set()
+encodings = []
 
 for enc_name, enc_result in encoder_results:
     name = enc_name.strip()
@@ -608,6 +612,7 @@ for enc_name, enc_result in encoder_results:
     print print_name + ':'
     print result_strip
     print
+    encodings.append({'name': print_name, 'result': result_strip})
 
 
 
@@ -651,6 +656,7 @@ for line in input_str.split('\n'):
 text_words_flat = reduce(lambda a,b: a+b, text_words)
 if sum(word[0] in alphabet and word in dictionary
        for word in text_words_flat) < len(text_words_flat)/2:
+    jsonout.result('ok', encodings=encodings)
     sys.exit()
 
 total = 0
@@ -738,3 +744,5 @@ for line in text_words:
         else:
             result.append(word)
     print ''.join(result)
+jsonout.result('ok', encodings=encodings, syllables=total,
+               exact=exact)
@@ -0,0 +1,151 @@
+
+# http://tools.qhex.org/
+#
+# Exact cover by dancing links (Knuth's Algorithm X), as a faster
+# backend than clasp for puzzles that are exact cover problems: given
+# --dlx on the command line, or QHEX_DLX=1, sudoku, shikaku and
+# polyominoes use it in place of their claspy models.
+#
+# Primary columns must be covered exactly once, and secondary columns
+# at most once. The nodes are kept in flat arrays of links rather than
+# objects, and the search is iterative, so that large grids don't run
+# into the recursion limit.
+
+import os
+import sys
+from array import array
+
+def enabled():
+    return '--dlx' in sys.argv[1:] or os.environ.get('QHEX_DLX') == '1'
+
+class ExactCover(object):
+    def __init__(self, primary, secondary=()):
+        self.names = list(primary) + list(secondary)
+        self.index = dict((name, i + 1) for i, name in enumerate(self.names))
+        self.rows = []  # row names, in the order they were added
+        n = len(self.names)
+        # node 0 is the root, and nodes 1..n are the column headers
+        self.L = array('i', [0] * (n + 1))
+        self.R = array('i', [0] * (n + 1))
+        self.U = array('i', range(n + 1))
+        self.D = array('i', range(n + 1))
+        self.C = array('i', range(n + 1))
+        self.row = array('i', [-1] * (n + 1))
+        self.S = array('i', [0] * (n + 1))
+        # only the primary columns are linked to the root, so only they
+        # are chosen to be covered
+        primary = len(self.names) - len(secondary)
+        order = range(primary + 1)
+        for i in order:
+            self.R[i] = order[(i + 1) % len(order)]
+            self.L[i] = order[i - 1]
+        for i in range(primary + 1, n + 1):
+            self.L[i] = self.R[i] = i
+
+    def add_row(self, name, columns):
+        """Adds a row covering the named columns."""
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        first = None
+        for c in sorted(set(self.index[col] for col in columns)):
+            x = len(C)
+            C.append(c)
+            self.row.append(len(self.rows))
+            U.append(U[c])
+            D.append(c)
+            D[U[c]] = x
+            U[c] = x
+            S[c] += 1
+            if first is None:
+                L.append(x)
+                R.append(x)
+                first = x
+            else:
+                L.append(L[first])
+                R.append(first)
+                R[L[first]] = x
+                L[first] = x
+        self.rows.append(name)
+
+    def cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    def solutions(self, limit=None):
+        """Yields the names of the rows in each solution, up to limit."""
+        R, D, C, S = self.R, self.D, self.C, self.S
+        def cover_row(x):
+            j = R[x]
+            while j != x:
+                self.cover(C[j])
+                j = R[j]
+        def uncover_row(x):
+            j = self.L[x]
+            while j != x:
+                self.uncover(C[j])
+                j = self.L[j]
+        found = 0
+        chosen = []  # the node of the row chosen at each level
+        try:
+            while True:
+                if R[0] == 0:
+                    yield [self.rows[self.row[x]] for x in chosen]
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+                else:
+                    # the column with the fewest rows left
+                    c, j = R[0], R[R[0]]
+                    while j != 0 and S[c] > 1:
+                        if S[j] < S[c]:
+                            c = j
+                        j = R[j]
+                    if S[c] > 0:
+                        self.cover(c)
+                        chosen.append(D[c])
+                        cover_row(D[c])
+                        continue
+                # backtrack to the last choice with another row to try
+                while chosen:
+                    x = chosen.pop()
+                    uncover_row(x)
+                    if D[x] != C[x]:
+                        chosen.append(D[x])
+                        cover_row(D[x])
+                        break
+                    self.uncover(C[x])
+                else:
+                    return
+        finally:
+            # stopped early: put the links back as they were
+            while chosen:
+                x = chosen.pop()
+                uncover_row(x)
+                self.uncover(C[x])
+
+    def count(self, limit=2):
+        """The number of solutions, counting no further than limit."""
+        return sum(1 for soln in self.solutions(limit))
@@ -6,6 +6,7 @@ from pprint import pprint as pp
 import time
 import sys
 import bisect
+import jsonout
 # import dictionary (below)
 
 def p(x):
@@ -430,10 +431,13 @@ def solve(raw_table):
             if len(answers) > 100:
                 answers = answers[:50]
     printed = set()
+    found = []
     print
     for score, answer, breakdown, derivation in answers:
         if answer not in printed:
             print split_words(answer, breakdown), '--', derivation#, '--', -score
+            found.append({'answer': split_words(answer, breakdown),
+                          'derivation': derivation})
             printed.add(answer)
             if len(printed) > 30:
                 break
@@ -443,7 +447,9 @@ def solve(raw_table):
         print int(t/60), 'minutes', int(t%60), 'seconds'
     else:
         print t, 'seconds'
+    jsonout.result('ok', answers=found)
 
+jsonout.start()
 x = sys.stdin.read()
 if '\t' in x:
     x = [row.split('\t') for row in x.split('\n') if row.strip()]
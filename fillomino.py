@@ -4,68 +4,182 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
+import gridstats
+import collections
 
-vals = map(lambda x: 0 if x == '`' else int(x),
-           reduce(lambda a,b: a+b, puz))
-max_val = max(vals)
+def components(g, cells, linked):
+    """Splits cells of the Grid g into the groups connected through
+    neighboring cells a, b with linked(a, b)."""
+    left = set(cells)
+    result = []
+    while left:
+        start = left.pop()
+        group = [start]
+        for r,c in group:
+            for n in g.orthogonal[r][c]:
+                if n in left and linked((r,c), n):
+                    left.remove(n)
+                    group.append(n)
+        result.append(group)
+    return result
 
-if sum(vals) < width*height:
-    print 'Not enough givens for a fillomino of size %d x %d.' % (width, height)
-    sys.exit()
+def domains(puz, max_val):
+    """Returns the values each cell may take, deduced from the givens,
+    or None if the givens contradict. A blank cell may take a value v
+    if it is close enough to a region of given v's to join it, or if it
+    is in a large enough area of blank cells not touching a given v. A
+    blank cell with one value left, or the one cell an incomplete region
+    can grow into, is filled in, and this repeats until nothing changes."""
+    height, width = len(puz), len(puz[0])
+    value = {}
+    for r,c in nrange(height, width):
+        value[(r,c)] = None if puz[r][c] == '`' else int(puz[r][c])
+    g = Grid(puz)
+    around = lambda (r, c): g.orthogonal[r][c]
+    while True:
+        dom = dict((x, set()) for x in value if value[x] is None)
+        given = [x for x in value if value[x] is not None]
+        regions = components(g, given, lambda a, b: value[a] == value[b])
+        complete = {}  # cell next to a complete region of v -> v
+        for region in regions:
+            v = value[region[0]]
+            if len(region) > v:
+                return None
+            if len(region) == v:
+                for x in region:
+                    for n in around(x):
+                        complete.setdefault(n, set()).add(v)
+        # blank cells close enough to a region to join it
+        for region in regions:
+            v = value[region[0]]
+            if len(region) == v: continue
+            # the fewest cells the region needs to reach each cell,
+            # not counting given v's it would join
+            size = dict((x, len(region)) for x in region)
+            queue = collections.deque(region)
+            while queue:
+                x = queue.popleft()
+                for n in around(x):
+                    if value[n] not in (None, v) or v in complete.get(n, ()):
+                        continue
+                    s = size[x] + (value[n] is None)
+                    if s > v or size.get(n, v + 1) <= s: continue
+                    size[n] = s
+                    if value[n] is None:
+                        dom[n].add(v)
+                        queue.append(n)
+                    else:
+                        queue.appendleft(n)
+        # blank areas large enough to hold a region of their own
+        for v in range(1, max_val + 1):
+            free = [x for x in dom
+                    if not any(value[n] == v for n in around(x))]
+            for area in components(g, free, lambda a, b: True):
+                if len(area) >= v:
+                    for x in area:
+                        dom[x].add(v)
+        # fill in the cells that have only one value left
+        fill = {}
+        for x, vals in dom.items():
+            if not vals:
+                return None
+            if len(vals) == 1:
+                fill[x] = min(vals)
+        for region in regions:
+            v = value[region[0]]
+            if len(region) == v: continue
+            grow = set(n for x in region for n in around(x)
+                       if value[n] is None and v in dom[n])
+            if not grow:
+                return None
+            if len(grow) == 1:
+                x = grow.pop()
+                if fill.get(x, v) != v:
+                    return None
+                fill[x] = v
+        if not fill:
+            break
+        value.update(fill)
+    for x in value:
+        if value[x] is not None:
+            dom[x] = set([value[x]])
+    return dom
+
+def build(puz):
+    height, width = len(puz), len(puz[0])
 
-set_max_val(width*height)
-grid = tmap(lambda x: IntVar(1,max_val) if x == '`' else IntVar(int(x)), puz)
+    vals = map(lambda x: 0 if x == '`' else int(x),
+               reduce(lambda a,b: a+b, puz))
+    max_val = max(vals)
 
-# create a flow field
-flow = [[MultiVar('^','v','>','<','.') for c in range(width)] for r in range(height)]
-flow_c = [[Atom() for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    # flow field terminates at a '.'
-    flow_c[r][c].prove_if(flow[r][c] == '.')
-    if r > 0:
-        flow_c[r][c].prove_if((flow[r][c] == '^') & flow_c[r-1][c] & (grid[r][c] == grid[r-1][c]))
-    if r < height-1:
-        flow_c[r][c].prove_if((flow[r][c] == 'v') & flow_c[r+1][c] & (grid[r][c] == grid[r+1][c]))
-    if c > 0:
-        flow_c[r][c].prove_if((flow[r][c] == '<') & flow_c[r][c-1] & (grid[r][c] == grid[r][c-1]))
-    if c < width-1:
-        flow_c[r][c].prove_if((flow[r][c] == '>') & flow_c[r][c+1] & (grid[r][c] == grid[r][c+1]))
-    require(flow_c[r][c])
+    if sum(vals) < width*height:
+        print 'Not enough givens for a fillomino of size %d x %d.' % (width, height)
+        sys.exit()
 
-# count cells that are upstream in the flow
-upstream = [[IntVar(0,max_val) for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    upstream_count = IntVar(0)
-    if r > 0:        upstream_count += cond(flow[r-1][c] == 'v', upstream[r-1][c], 0)
-    if r < height-1: upstream_count += cond(flow[r+1][c] == '^', upstream[r+1][c], 0)
-    if c > 0:        upstream_count += cond(flow[r][c-1] == '>', upstream[r][c-1], 0)
-    if c < width-1:  upstream_count += cond(flow[r][c+1] == '<', upstream[r][c+1], 0)
-    require(upstream[r][c] == upstream_count + 1)
-    require(cond(flow[r][c] == '.', upstream[r][c] == grid[r][c], True))
+    g = Grid(puz)
+    dom = domains(puz, max_val)
+    if dom is None:  # contradictory givens, left for the solver to report
+        dom = dict((x, set(range(1, max_val + 1)) if puz[x[0]][x[1]] == '`'
+                    else set([int(puz[x[0]][x[1]])]))
+                   for x in nrange(height, width))
+    else:
+        gridstats.stats['propagation'] = {
+            'fixed': sum(len(d) == 1 for d in dom.values()),
+            'candidates': sum(map(len, dom.values()))}
+    # upstream counts add up to 4 neighbors' counts
+    set_max_val(4*max_val + 1)
+    grid = [[IntVar(min(dom[(r,c)]), max(dom[(r,c)])) for c in range(width)]
+            for r in range(height)]
+    for r,c in nrange(height, width):
+        for v in range(min(dom[(r,c)]), max(dom[(r,c)])):
+            if v not in dom[(r,c)]:
+                require(grid[r][c] != v)
+
+    # create a flow field
+    flow = [[MultiVar('^','v','>','<','.') for c in range(width)] for r in range(height)]
+    flow_c = [[Atom() for c in range(width)] for r in range(height)]
+    for r,c in nrange(height, width):
+        # flow field terminates at a '.'
+        flow_c[r][c].prove_if(flow[r][c] == '.')
+        for d,r1,c1 in g.directions[r][c]:
+            flow_c[r][c].prove_if((flow[r][c] == d) & flow_c[r1][c1] & (grid[r][c] == grid[r1][c1]))
+        require(flow_c[r][c])
 
-# require no two groups to come in contact.
-# each group is identified by the cell number of the flow field target (row*width + col).
-group = [[IntVar(0,width*height) for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    require(cond(flow[r][c] == '.', group[r][c] == r*width + c, True))
-# require vertically adjacent to have the same group
-for r,c in nrange(height-1, width):
-    require(cond(grid[r][c] == grid[r+1][c], group[r][c] == group[r+1][c], True))
-# require horizontally adjacent to have the same group
-for r,c in nrange(height, width-1):
-    require(cond(grid[r][c] == grid[r][c+1], group[r][c] == group[r][c+1], True))
+    # count cells that are upstream in the flow
+    upstream = [[IntVar(0,max_val) for c in range(width)] for r in range(height)]
+    for r,c in nrange(height, width):
+        upstream_count = IntVar(0)
+        for d,r1,c1 in g.directions[r][c]:
+            upstream_count += cond(flow[r1][c1] == OPPOSITE[d], upstream[r1][c1], 0)
+        require(upstream[r][c] == upstream_count + 1)
+        require(cond(flow[r][c] == '.', upstream[r][c] == grid[r][c], True))
 
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    p(grid)
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
+    # require no two groups to come in contact.
+    # each group is identified by the cell number of the flow field
+    # target (row*width + col), which is within reach of its cells.
+    group = [[None for c in range(width)] for r in range(height)]
     for r,c in nrange(height, width):
-        x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+        reach = max(dom[(r,c)]) - 1
+        roots = []
+        for r1 in range(max(0, r-reach), min(height, r+reach+1)):
+            for c1 in range(max(0, c-reach), min(width, c+reach+1)):
+                distance = abs(r1-r) + abs(c1-c)
+                if any(distance < v for v in dom[(r,c)] & dom[(r1,c1)]):
+                    roots.append(r1*width + c1)
+        group[r][c] = MultiVar(*roots)
+        require(cond(flow[r][c] == '.', group[r][c] == r*width + c, True))
+    # require adjacent cells with the same number to have the same group
+    for (r,c), (r1,c1) in g.pairs:
+        require(cond(grid[r][c] == grid[r1][c1], group[r][c] == group[r1][c1], True))
+
+    return grid
+
+def show(puz, soln):
+    p(soln)
+
+def solve_grid(puz):
+    solve_puzzle(puz, build, show, Symmetry(ALL))
+
+if __name__ == '__main__':
+    run(solve_grid)
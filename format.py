@@ -10,6 +10,8 @@ import shlex
 import re
 import sre_constants
 import math
+import json
+import solverd
 
 input_str = sys.stdin.read()
 lines = input_str.split('\n')
@@ -224,9 +226,7 @@ def cmd_print(x, seq=None, align='right'):
         result.append(s)
     return '\n'.join(result)
 
-tools = os.listdir(os.path.dirname(__file__))
-tools = set(map(lambda s: s.split('.')[0], tools))
-tools.remove('format')
+tools = set(solverd.tools)
 tool_run = False  # has a tool been run? (only one is allowed)
 
 for command in commands:
@@ -273,28 +273,39 @@ for command in commands:
             print
             print 'running', command_joined
             print
-            p = subprocess.Popen([os.path.join(os.path.dirname(__file__),
-                                               '%s.py' % command_joined)],
-                                 stdin=subprocess.PIPE,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE,
-                                 bufsize=1)
             if type(input_str) is not str:
                 print 'WARNING: Input is not a string.'
                 print 'You may want to use "print" or "join" first.'
                 print
                 input_str = str(input_str)
-            p.stdin.write(input_str)
-            p.stdin.close()
-            result = []
+            p = solverd.request(command_joined, input_str, ['--json'])
+            if p is None:  # no daemon running
+                p = subprocess.Popen([os.path.join(os.path.dirname(__file__),
+                                                   '%s.py' % command_joined),
+                                      '--json'],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE,
+                                     bufsize=1)
+                p.stdin.write(input_str)
+                p.stdin.close()
+            result = None
             for line in iter(p.stdout.readline, ''):
-                print line,
-                result.append(line)
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue  # not from jsonout
+                if 'status' in msg:
+                    result = msg
+                elif 'line' in msg:  # the output, as it is printed
+                    sys.stdout.write(msg['line'].encode('utf-8'))
+                    sys.stdout.flush()
             err = p.stderr.read()
-            if err:
+            if err or result is None or result['status'] == 'error':
                 print
-                raise CommandError(err)
-            input_str = ''.join(result)
+                raise CommandError(err or (result or {}).get('message') or
+                                   'no result from ' + command_joined)
+            input_str = result['output'].encode('utf-8')
             print
             print 'completed', command_joined
             print
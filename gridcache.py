@@ -0,0 +1,196 @@
+
+# http://tools.qhex.org/
+#
+# An on-disk cache of grid puzzle solutions, enabled by setting
+# QHEX_CACHE to a directory.
+#
+# Puzzles are stored under a canonical form, so a rotated, reflected,
+# or (for sudoku) relabeled copy of a solved puzzle is a cache hit.
+# Each entry is a separate file, written atomically, so several
+# processes can share the cache. Once the directory is larger than
+# QHEX_CACHE_SIZE bytes, the least recently used entries are removed.
+# Entries are keyed on the source of the solver and of the modules its
+# model is built with, so changing either starts a fresh set.
+
+import os
+import json
+import hashlib
+import inspect
+import imp
+import tempfile
+
+MAX_BYTES = int(os.environ.get('QHEX_CACHE_SIZE', 64 * 2**20))
+
+# A transform is a number from 0 to 7. Bit 0 transposes the grid,
+# then bit 1 reverses the rows and bit 2 reverses the columns.
+ALL = range(8)
+ROTATIONS = [0, 3, 5, 6]
+TRANSPOSE = [0, 1]
+IDENTITY = [0]
+
+class Symmetry(object):
+    """Describes the transforms of a puzzle that give an equivalent
+    puzzle. puz_maps and soln_maps are how a transpose, a row reversal
+    and a column reversal change each cell of the puzzle and of the
+    solution; each is a dict, a function, or None. symbols, if given,
+    returns all the symbols a solution may use, and the puzzle is
+    canonical under relabeling them."""
+    def __init__(self, transforms=ALL, puz_maps=(None, None, None),
+                 soln_maps=(None, None, None), symbols=None):
+        self.transforms = transforms
+        self.puz_maps = puz_maps
+        self.soln_maps = soln_maps
+        self.symbols = symbols
+
+def remap(m, x):
+    if m is None: return x
+    if callable(m): return m(x)
+    return m.get(x, x)
+
+def transform(grid, t, maps):
+    if t & 1:
+        grid = map(list, zip(*grid))
+        grid = [[remap(maps[0], x) for x in row] for row in grid]
+    if t & 2:
+        grid = [[remap(maps[1], x) for x in row] for row in grid[::-1]]
+    if t & 4:
+        grid = [[remap(maps[2], x) for x in row[::-1]] for row in grid]
+    return grid
+
+def untransform(grid, t, maps):
+    if t & 4:
+        grid = [[remap(maps[2], x) for x in row[::-1]] for row in grid]
+    if t & 2:
+        grid = [[remap(maps[1], x) for x in row] for row in grid[::-1]]
+    if t & 1:
+        grid = map(list, zip(*grid))
+        grid = [[remap(maps[0], x) for x in row] for row in grid]
+    return grid
+
+def labeling(puz, symbols):
+    """Numbers the given symbols in order of appearance, and the rest
+    of the symbols in sorted order."""
+    labels = {}
+    for x in reduce(lambda a,b: a+b, puz) + sorted(symbols):
+        if x != '`' and x not in labels:
+            labels[x] = str(len(labels) + 1)
+    return labels
+
+def canonical(puz, symmetry):
+    """Returns the canonical text of puz, with the transform and
+    labeling that produce it."""
+    best = None
+    for t in symmetry.transforms:
+        grid = transform(puz, t, symmetry.puz_maps)
+        labels = None
+        if symmetry.symbols:
+            labels = labeling(grid, symmetry.symbols(puz))
+            grid = [[labels.get(x, x) for x in row] for row in grid]
+        text = '\n'.join(' '.join(row) for row in grid)
+        if best is None or text < best[0]:
+            best = (text, t, labels)
+    return best
+
+def to_str(x):
+    """Undoes json's conversion of strings to unicode."""
+    if type(x) is list: return map(to_str, x)
+    if type(x) is unicode: return str(x)
+    return x
+
+# the modules that models are built with, besides the solver's own
+SHARED = ['claspy', 'gridinput', 'gridsolve', 'exactcover', 'connectivity',
+          'automaton']
+shared_hash = []
+
+def shared_sources():
+    """Returns a hash of the source of the shared modules, so that
+    changing any of them makes the cached solutions stale."""
+    if not shared_hash:
+        h = hashlib.sha1()
+        for name in SHARED:
+            try:
+                f, path, info = imp.find_module(name)
+            except ImportError:
+                continue
+            if f:
+                h.update(name + '\0' + f.read() + '\0')
+                f.close()
+        shared_hash.append(h.hexdigest())
+    return shared_hash[0]
+
+class Cache(object):
+    """The cached solutions of one puzzle."""
+    def __init__(self, path, puz, build, symmetry):
+        self.symmetry = symmetry
+        source = inspect.getsourcefile(build)
+        name = os.path.basename(source).split('.')[0]
+        text, self.t, self.labels = canonical(puz, symmetry)
+        key = hashlib.sha1(name + '\0' +
+                           hashlib.sha1(open(source).read()).hexdigest() +
+                           '\0' + shared_sources() + '\0' + text).hexdigest()
+        self.dir = path
+        self.path = os.path.join(path, key)
+
+    def to_canonical(self, soln):
+        soln = transform(soln, self.t, self.symmetry.soln_maps)
+        if self.labels:
+            soln = [[self.labels.get(x, x) for x in row] for row in soln]
+        return soln
+
+    def from_canonical(self, soln):
+        if self.labels:
+            unlabel = dict((v, k) for k, v in self.labels.items())
+            soln = [[unlabel.get(x, x) for x in row] for row in soln]
+        return untransform(soln, self.t, self.symmetry.soln_maps)
+
+    def get(self):
+        """Returns the cached solutions, or None."""
+        try:
+            f = open(self.path)
+            solns = json.load(f)['solutions']
+            f.close()
+            os.utime(self.path, None)  # mark as recently used
+        except (IOError, OSError, ValueError):
+            return None
+        return [self.from_canonical(to_str(soln)) for soln in solns]
+
+    def put(self, solns):
+        data = json.dumps({'solutions': map(self.to_canonical, solns)})
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.dir, prefix='.tmp')
+            os.write(fd, data)
+            os.close(fd)
+            os.rename(tmp, self.path)
+            self.evict()
+        except (IOError, OSError):
+            pass  # the cache is optional
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.dir):
+            try:
+                st = os.stat(os.path.join(self.dir, name))
+            except OSError:
+                continue  # removed by another process
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= MAX_BYTES:
+                break
+            try:
+                os.remove(os.path.join(self.dir, name))
+            except OSError:
+                pass
+            total -= size
+
+def open_cache(puz, build, symmetry):
+    """Returns the Cache for puz, or None if caching is off."""
+    path = os.environ.get('QHEX_CACHE')
+    if not path or symmetry is None:
+        return None
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path): return None
+    return Cache(path, puz, build, symmetry)
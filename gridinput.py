@@ -2,26 +2,54 @@
 # http://tools.qhex.org/
 #
 # Reads a grid puzzle from stdin.
-# Defines puz, height, width, and convenience functions.
+# Defines read_grid, parse_grid, split_grids, the Grid class with its
+# tables of neighboring cells, and convenience functions.
 
 import sys
+import time
+import gridstats
+import jsonout
 
-puz = sys.stdin.read().replace('\t',' ')
-if '`' not in puz: puz = puz.replace('_','`')
-if '`' not in puz: puz = puz.replace('.','`')
-puz = map(lambda row: filter(bool, row.split(' ')),
-          filter(bool, puz.split('\n')))
+def parse_grid(puz):
+    """Splits puzzle text into a list of rows of cell strings."""
+    puz = puz.replace('\t',' ')
+    if '`' not in puz: puz = puz.replace('_','`')
+    if '`' not in puz: puz = puz.replace('.','`')
+    puz = map(lambda row: filter(bool, row.split(' ')),
+              filter(bool, puz.split('\n')))
 
-if all(len(row) == 1 for row in puz):  # parse without spaces
-    puz = map(lambda row: list(row[0].strip()), puz)
+    if all(len(row) == 1 for row in puz):  # parse without spaces
+        puz = map(lambda row: list(row[0].strip()), puz)
+    return puz
 
-height = len(puz)
-width = len(puz[0])
-for row in puz:
-    if len(row) != width:
-        print 'Error: array is not rectangular at row:\n'
-        print ' '.join(row)
-        sys.exit()
+def read_grid(text=None):
+    """Reads the puzzle from stdin, or from text if given. Exits if it
+    is not rectangular."""
+    jsonout.start()
+    start = time.time()
+    if text is None:
+        text = sys.stdin.read()
+    puz = parse_grid(text)
+    width = len(puz[0])
+    for row in puz:
+        if len(row) != width:
+            print 'Error: array is not rectangular at row:\n'
+            print ' '.join(row)
+            sys.exit()
+    gridstats.parsed(puz, start)
+    return puz
+
+SEPARATOR = '---'
+
+def split_grids(text):
+    """Splits input holding several grids, separated by lines of ---."""
+    grids = [[]]
+    for line in text.split('\n'):
+        if line.strip() == SEPARATOR:
+            grids.append([])
+        else:
+            grids[-1].append(line)
+    return filter(lambda grid: grid.strip(), map('\n'.join, grids))
 
 def p(x):
     widths = [0] * max(map(len, x))
@@ -44,3 +72,67 @@ def nrange(*dim_sizes):
 
 def tmap(f, *args):
     return map(lambda *args1: map(f, *args1), *args)
+
+# the direction from a cell to each orthogonal neighbor
+DIRECTIONS = [('^', -1, 0), ('v', 1, 0), ('<', 0, -1), ('>', 0, 1)]
+OPPOSITE = {'^': 'v', 'v': '^', '<': '>', '>': '<'}
+
+table_cache = {}  # (height, width) -> tables
+
+def neighbor_tables(height, width):
+    """Builds the tables of neighboring cells for a grid size. Each
+    table is indexed [r][c] and lists cells as (r, c)."""
+    if (height, width) in table_cache:
+        return table_cache[(height, width)]
+    def inside(r, c):
+        return r >= 0 and r < height and c >= 0 and c < width
+    def table(offsets):
+        return [[[(r+dr, c+dc) for dr, dc in offsets if inside(r+dr, c+dc)]
+                 for c in range(width)] for r in range(height)]
+    # clockwise from the top left
+    ring = [(-1,-1), (-1,0), (-1,1), (0,1), (1,1), (1,0), (1,-1), (0,-1)]
+    t = {}
+    t['orthogonal'] = table([(dr, dc) for d, dr, dc in DIRECTIONS])
+    t['around'] = table(ring)
+    # all 8 cells around, with None for those off the grid
+    t['ring'] = [[[(r+dr, c+dc) if inside(r+dr, c+dc) else None
+                   for dr, dc in ring]
+                  for c in range(width)] for r in range(height)]
+    t['directions'] = [[[(d, r+dr, c+dc) for d, dr, dc in DIRECTIONS
+                         if inside(r+dr, c+dc)]
+                        for c in range(width)] for r in range(height)]
+    # each pair of orthogonally adjacent cells, once
+    t['pairs'] = ([((r,c), (r+1,c)) for r, c in nrange(height-1, width)] +
+                  [((r,c), (r,c+1)) for r, c in nrange(height, width-1)])
+    # each 2x2 block of cells
+    t['windows'] = [[(r,c), (r,c+1), (r+1,c), (r+1,c+1)]
+                    for r, c in nrange(height-1, width-1)]
+    t['rows'] = [[(r,c) for c in range(width)] for r in range(height)]
+    t['cols'] = [[(r,c) for r in range(height)] for c in range(width)]
+    table_cache[(height, width)] = t
+    return t
+
+class Grid(object):
+    """The cells of a puzzle in one flat list, row by row, with the
+    tables of neighboring cells for its size as attributes."""
+    def __init__(self, puz):
+        self.height, self.width = len(puz), len(puz[0])
+        self.cells = [x for row in puz for x in row]
+        self.__dict__.update(neighbor_tables(self.height, self.width))
+
+    def __getitem__(self, (r, c)):
+        return self.cells[r * self.width + c]
+
+    def runs(self, is_break, lines=None):
+        """The maximal runs of cells along lines, by default the rows
+        and then the columns, that contain no cell x with is_break(x)."""
+        result = []
+        for line in lines or self.rows + self.cols:
+            run = []
+            for cell in line + [None]:
+                if cell is None or is_break(self[cell]):
+                    if run: result.append(run)
+                    run = []
+                else:
+                    run.append(cell)
+        return result
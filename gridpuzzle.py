@@ -7,6 +7,14 @@ import os
 import subprocess
 import signal
 import time
+import threading
+import Queue
+import json
+from gridinput import parse_grid
+import solverd
+
+MAX_WORKERS = 4   # number of solvers probed at once
+TIME_LIMIT = 60   # seconds for the whole request
 
 input_str = sys.stdin.read()
 
@@ -27,52 +35,197 @@ shikaku
 fillomino'''
 puzzles = puzzles.split('\n')
 
+def is_int(x):
+    try:
+        int(x)
+        return True
+    except ValueError:
+        return False
+
+def grid_features(puz):
+    """Cheap facts about the grid that decide which solvers can
+    accept it."""
+    f = {}
+    f['height'], f['width'] = len(puz), len(puz[0])
+    cells = reduce(lambda a,b: a+b, puz)
+    givens = [x for x in cells if x != '`']
+    f['symbols'] = set(givens)
+    f['numbers'] = all(map(is_int, givens))
+    if f['numbers']:
+        vals = map(int, givens)
+        f['min'], f['max'] = min(vals + [0]), max(vals + [0])
+        f['total'] = sum(vals)
+    # kakuro clues are down\right, either part may be blank
+    clues = [x.split('\\') for x in givens if '\\' in x and x != '\\']
+    f['kakuro_clues'] = len(clues)
+    f['kakuro_valid'] = all(len(clue) == 2 and
+                            all(n == '' or is_int(n) for n in clue)
+                            for clue in clues)
+    f['tapa'] = all(all(map(is_int, x.split(','))) for x in givens)
+    # thermometers have sums along the last row and column
+    sums = puz[-1][:-1] + [row[-1] for row in puz[:-1]]
+    f['therm_symbols'] = any(x in 'o><^v' for x in cells)
+    f['therm_sums'] = [x for x in sums if x != '`']
+    return f
+
+def verdict(puzzle, f):
+    """Returns the verdict for a solver that would reject the grid
+    without solving it, or None if the solver has to be run."""
+    height, width = f['height'], f['width']
+    if puzzle == 'maysu':
+        if not f['symbols'] <= set(['x', 'o']): return 'invalid'
+    elif puzzle == 'sudoku':
+        box = int(round(height ** 0.5))
+        if height != width or box < 2 or box*box != height: return 'invalid'
+        if len(f['symbols']) > height: return 'invalid'
+    elif puzzle == 'lightsout':
+        if not f['symbols'] <= set(['#']): return 'invalid'
+    elif puzzle == 'thermometers':
+        if not f['therm_symbols']: return 'invalid'
+        if len(f['therm_sums']) < (width+height-2)/2: return 'invalid'
+        if not all(map(is_int, f['therm_sums'])): return 'invalid'
+    elif puzzle == 'kakuro':
+        if f['kakuro_clues'] < (width+height)/2: return 'invalid'
+        if not f['kakuro_valid']: return 'invalid'
+    elif puzzle == 'hitori':
+        if width < 2: return 'invalid'
+    elif puzzle == 'tapa':
+        if not f['tapa']: return 'invalid'
+    elif puzzle == 'numberlink':
+        pass
+    else:  # clues are numbers
+        if not f['numbers']: return 'invalid'
+        if puzzle == 'fillomino' and f['total'] < width*height:
+            return 'invalid'
+        if puzzle == 'minesweeper' and (f['min'] < 0 or f['max'] > 8):
+            return 'no solutions'
+        if puzzle == 'fillapix' and (f['min'] < 0 or f['max'] > 9):
+            return 'no solutions'
+    return None
+
 start_time = time.time()
 here = os.path.dirname(__file__)
-for puzzle in puzzles:
-    p = subprocess.Popen( \
-        [os.path.join(here, '%s.py' % puzzle)],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        bufsize=1)
-    p.stdin.write(input_str)
-    p.stdin.close()
-    stdout = ''
+
+lock = threading.RLock()  # guards everything below, and printing
+running = {}     # puzzle -> Popen of a probe in progress
+reported = set() # puzzles whose verdict has been printed
+expired = [False]
+
+def kill_group(p):
+    """Kills a probe along with its clasp subprocess. Each probe runs
+    in its own process group so the whole group can be killed."""
+    if isinstance(p, solverd.Request):
+        p.kill()  # the daemon kills the worker's group
+        return
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except OSError:
+        pass  # already gone
+
+def kill_all(*args):
+    with lock:
+        for p in running.values():
+            kill_group(p)
+    if args:  # called as a signal handler
+        os._exit(1)
+
+# wsgi kills gridpuzzle rather than its process group, so pass the
+# signal on to the probes, which are no longer in our group.
+for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+    signal.signal(sig, kill_all)
+
+def report(puzzle, lines):
+    with lock:
+        if expired[0] or puzzle in reported:
+            return
+        reported.add(puzzle)
+        for line in lines:
+            print line
+
+def probe(puzzle):
+    p = solverd.request(puzzle, input_str, ['--json'])
+    if p is None:  # no daemon running
+        p = subprocess.Popen( \
+            [os.path.join(here, '%s.py' % puzzle), '--json'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1,
+            preexec_fn=os.setsid)
+        try:
+            p.stdin.write(input_str)
+            p.stdin.close()
+        except IOError:
+            pass  # the solver exited before reading its input
+    with lock:
+        running[puzzle] = p
+        if expired[0]:
+            kill_group(p)
+    solutions = []
+    status = None
     for line in iter(p.stdout.readline, ''):
-        if line.startswith('Solution 2'):
-            try:
-                if p.poll() is None:
-                    os.kill(p.pid, signal.SIGKILL)
-                    # This may not kill the clasp subprocess. :(
-                    # Normally we could use setsid and kill the group,
-                    # but wsgi needs to be able to kill gridpuzzle and all children.
-            except OSError, err:
-                print err
-            stdout = 'killed'
-            break
-        stdout += line
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue  # not from jsonout
+        if 'solution' in msg:
+            solutions.append(msg['text'])
+            if len(solutions) == 2:
+                kill_group(p)
+                break
+        elif 'status' in msg:
+            status = msg['status']
+    stderr = p.stderr.read() if len(solutions) < 2 else ''
+    p.wait()
+    kill_group(p)
+    with lock:
+        del running[puzzle]
     t = '[%.1fs]' % (time.time() - start_time)
-    if stdout == 'killed':
-        print t, puzzle + ': multiple solutions'
-        continue
-    stderr = p.stderr.read()
-    if len(stderr) > 0:
-        print t, puzzle + ': invalid'
-        continue
-    if '\nSATISFIABLE' not in stdout:
-        if '\nUNSATISFIABLE' in stdout:
-            print t, puzzle + ': no solutions'
-        else:
-            print t, puzzle + ': invalid'
-        continue
-    print
-    printing = False
-    for line in stdout.split('\n'):
-        if line.startswith('Checking for other solutions'):
-            printing = False
-        if line.startswith('Solution '):
-            printing = True
-            print t, puzzle, 'solution:'
-        elif printing:
-            print line
+    if len(solutions) >= 2 or status == 'multiple':
+        return [t + ' ' + puzzle + ': multiple solutions']
+    if len(stderr) > 0 or status in (None, 'error'):
+        return [t + ' ' + puzzle + ': invalid']
+    if status == 'none' or not solutions:
+        return [t + ' ' + puzzle + ': no solutions']
+    return ['', t + ' ' + puzzle + ' solution:'] + \
+        solutions[0].rstrip('\n').split('\n') + ['']
+
+def worker(queue):
+    while not expired[0]:
+        try:
+            puzzle = queue.get_nowait()
+        except Queue.Empty:
+            return
+        report(puzzle, probe(puzzle))
+
+puz = parse_grid(input_str)
+if not puz or any(len(row) != len(puz[0]) for row in puz):
+    features = None  # every solver rejects it
+else:
+    features = grid_features(puz)
+
+queue = Queue.Queue()
+for puzzle in puzzles:
+    v = verdict(puzzle, features) if features else 'invalid'
+    if v is None:
+        queue.put(puzzle)
+    else:
+        report(puzzle, ['[%.1fs] %s: %s' % (time.time() - start_time, puzzle, v)])
+workers = [threading.Thread(target=worker, args=(queue,))
+           for i in range(min(MAX_WORKERS, len(puzzles)))]
+for w in workers:
+    w.daemon = True
+    w.start()
+for w in workers:
+    while w.is_alive() and time.time() < start_time + TIME_LIMIT:
+        w.join(0.1)
+
+with lock:
+    expired[0] = True
+    t = '[%.1fs]' % (time.time() - start_time)
+    for puzzle in puzzles:
+        if puzzle not in reported:
+            print t, puzzle + ': timed out'
+kill_all()
+for w in workers:
+    w.join(1)  # let the workers see their probes die
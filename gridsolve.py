@@ -0,0 +1,360 @@
+
+# http://tools.qhex.org/
+#
+# The solve loop shared by the claspy solvers. Prints each solution,
+# then checks for others by ruling out the solutions already found.
+#
+# Normally each check runs clasp again on the whole program, as claspy
+# does. With QHEX_INCREMENTAL=1 and the clingo python module installed,
+# the program is instead loaded into one clasp session, and each check
+# only adds the new rules and resumes the search.
+#
+# run() also accepts a batch of grids separated by lines of ---, and
+# solves them in one process, or in QHEX_BATCH_WORKERS processes.
+#
+# A solver may leave rules out of its model, such as those for
+# connectivity, and add just the ones a solution breaks before solving
+# again, by passing cuts to solve_puzzle().
+#
+# solve_cover() is the same loop for puzzles given as an exact cover,
+# solved by dancing links in place of clasp.
+
+import sys
+import os
+import time
+import traceback
+import multiprocessing
+import claspy
+from claspy import *
+import gridcache
+import exactcover
+import gridstats
+import jsonout
+from gridcache import Symmetry, ALL, ROTATIONS, TRANSPOSE, IDENTITY
+from gridinput import read_grid, split_grids
+
+MAX_SOLUTIONS = 10
+BATCH_WORKERS = int(os.environ.get('QHEX_BATCH_WORKERS', 1))
+
+try:
+    import clingo
+except ImportError:
+    clingo = None
+
+def variables(x):
+    """Returns a flat list of the claspy variables in nested lists."""
+    if type(x) is list:
+        return reduce(lambda a,b: a+b, map(variables, x), [])
+    return [x] if hasattr(x, 'value') else []
+
+def values(x):
+    """Returns nested lists with each variable replaced by its value."""
+    if type(x) is list:
+        return map(values, x)
+    return x.value() if hasattr(x, 'value') else x
+
+def block(grid):
+    """Rules out the current values of the variables in grid."""
+    require(at_least(1, [~(v == v.value()) for v in variables(grid)]))
+
+class Tee(object):
+    """Passes writes on to a file, keeping a copy of the text."""
+    def __init__(self, f):
+        self.f = f
+        self.text = ''
+    def write(self, s):
+        self.f.write(s)
+        self.text += s
+    def flush(self):
+        self.f.flush()
+
+class Session(object):
+    """Solves by running clasp on the whole program each time."""
+    def __init__(self):
+        self.answered = True  # whether clasp answered every solve
+
+    def solve(self):
+        gridstats.built()
+        info = {'vars': claspy.last_bool, 'rules': len(claspy.clasp_rules)}
+        start = time.time()
+        out = sys.stdout = Tee(sys.stdout)
+        try:
+            result = solve()
+        finally:
+            sys.stdout = out.f
+        info['seconds'] = time.time() - start
+        info.update(gridstats.clasp_stats(out.text))
+        if 'clasp' in info:  # the rest is writing the rules to clasp
+            info['emit'] = max(0.0, info['seconds'] - info['clasp'])
+        info['result'] = bool(result)
+        gridstats.solved(info)
+        if '\nSATISFIABLE' not in out.text and \
+                '\nUNSATISFIABLE' not in out.text:
+            self.answered = False  # clasp failed
+        return result
+
+class IncrementalSession(object):
+    """Keeps one clasp session, passing it the claspy rules added since
+    the last solve."""
+    def __init__(self):
+        self.control = clingo.Control()
+        self.atoms = {}  # claspy atom -> clingo atom
+        self.rules_sent = 0
+        self.answered = True
+
+    def atom(self, backend, a):
+        if a not in self.atoms:
+            self.atoms[a] = backend.add_atom()
+        return self.atoms[a]
+
+    def add_rules(self, rules):
+        """Adds rules in the smodels format that claspy writes for clasp."""
+        with self.control.backend() as backend:
+            atom = lambda a: self.atom(backend, a)
+            def body(vals):  # n m [negative] [positive]
+                n, m = vals[0], vals[1]
+                return ([-atom(a) for a in vals[2:2+m]] +
+                        [atom(a) for a in vals[2+m:2+n]])
+            def head(a):  # atom 1 is false, as in lparse
+                return [] if a == 1 else [atom(a)]
+            for rule in rules:
+                rule = map(int, ' '.join(map(str, rule)).split())
+                if rule[0] == 1:  # basic
+                    backend.add_rule(head(rule[1]), body(rule[2:]))
+                elif rule[0] == 2:  # constraint: head n m bound ...
+                    lits = body(rule[2:4] + rule[5:])
+                    backend.add_weight_rule(head(rule[1]), rule[4],
+                                            [(l, 1) for l in lits])
+                elif rule[0] == 3:  # choice: #heads heads n m ...
+                    heads = map(atom, rule[2:2+rule[1]])
+                    backend.add_rule(heads, body(rule[2+rule[1]:]), True)
+                elif rule[0] == 5:  # weight: head bound n m ... weights
+                    n = rule[3]
+                    lits = body(rule[3:5+n])
+                    backend.add_weight_rule(head(rule[1]), rule[2],
+                                            zip(lits, rule[5+n:5+2*n]))
+                else:
+                    raise ValueError('unsupported rule type %d' % rule[0])
+
+    def solve(self):
+        gridstats.built()
+        rules = claspy.clasp_rules
+        print 'Solving', claspy.last_bool, 'variables,', len(rules), 'rules'
+        info = {'vars': claspy.last_bool, 'rules': len(rules)}
+        start = time.time()
+        self.add_rules(rules[self.rules_sent:])
+        self.rules_sent = len(rules)
+        info['emit'] = time.time() - start
+        model = []
+        def on_model(m):
+            model.append(set(a for a in self.atoms if m.is_true(self.atoms[a])))
+        start = time.time()
+        result = self.control.solve(on_model=on_model)
+        info['search'] = time.time() - start
+        info['seconds'] = info['emit'] + info['search']
+        info['atoms'] = len(self.atoms)
+        try:
+            info['constraints'] = int(self.control.statistics['problem']
+                                      ['generator']['constraints'])
+        except (KeyError, TypeError):
+            pass
+        info['result'] = bool(result.satisfiable)
+        gridstats.solved(info)
+        if result.satisfiable:
+            claspy.solution = model[-1]
+            print 'SATISFIABLE'
+        else:
+            print 'UNSATISFIABLE'
+        print
+        return bool(result.satisfiable)
+
+def session():
+    if clingo and os.environ.get('QHEX_INCREMENTAL') == '1':
+        return IncrementalSession()
+    return Session()
+
+def solutions(grid, s=None, cuts=None):
+    """Yields up to MAX_SOLUTIONS solutions. grid holds the variables
+    that make up a solution, in nested lists, and each solution is the
+    same lists holding their values. cuts(grid, soln), if given, returns
+    rules that the model leaves out and soln breaks, or [] if soln is a
+    solution; the rules are added and clasp is run again."""
+    s = s or session()
+    soln_count = 0
+    while s.solve():
+        soln = values(grid)
+        if cuts:
+            rules = cuts(grid, soln)
+            if rules:
+                for rule in rules:
+                    require(rule)
+                stats = gridstats.stats.setdefault('cuts',
+                                                   {'rounds': 0, 'rules': 0})
+                stats['rounds'] += 1
+                stats['rules'] += len(rules)
+                continue
+        yield soln
+        soln_count += 1
+        if soln_count >= MAX_SOLUTIONS:
+            return
+        block(grid)
+
+def cached(solns):
+    """Yields solutions from the cache, printing what clasp would."""
+    for soln in solns:
+        print 'Solution found in cache'
+        print 'SATISFIABLE'
+        print
+        yield soln
+    print 'No other solutions in cache'
+    print 'UNSATISFIABLE'
+    print
+
+def print_solutions(solns, show):
+    """Prints each solution with show(soln). Returns them in a list."""
+    found = []
+    for soln in solns:
+        found.append(soln)
+        print 'Solution %d:' % len(found)
+        start = time.time()
+        out = sys.stdout = Tee(sys.stdout)
+        try:
+            show(soln)
+        finally:
+            sys.stdout = out.f
+        gridstats.shown(time.time() - start)
+        jsonout.solution(soln, out.text)
+        print
+        if len(found) >= MAX_SOLUTIONS:
+            print 'Too many solutions...'
+            break
+        print 'Checking for other solutions'
+    return found
+
+def finish(solns, answered):
+    """Writes the statistics and the status of a run."""
+    gridstats.write()
+    if len(solns) >= MAX_SOLUTIONS:
+        status = 'multiple'
+    elif not answered:
+        jsonout.error('clasp_failed', 'clasp did not finish')
+        return
+    else:
+        status = ['none', 'unique', 'multiple'][min(len(solns), 2)]
+    jsonout.result(status, count=len(solns),
+                   more=len(solns) >= MAX_SOLUTIONS, stats=gridstats.stats)
+
+def solve_loop(grid, show, s=None):
+    s = s or session()
+    solns = print_solutions(solutions(grid, s), show)
+    finish(solns, s.answered)
+    return solns
+
+def solve_puzzle(puz, build, show, symmetry=None, cuts=None):
+    """Solves a grid puzzle. build(puz) defines the claspy model and
+    returns the solution variables. show(puz, soln) prints a solution.
+    symmetry is a gridcache.Symmetry, if the result may be cached.
+    cuts adds rules lazily, as for solutions()."""
+    cache = gridcache.open_cache(puz, build, symmetry)
+    solns = cache and cache.get()
+    if solns is not None:
+        gridstats.stats['cached'] = True
+        solns = print_solutions(cached(solns), lambda soln: show(puz, soln))
+        answered = True
+    else:
+        s = session()
+        solns = print_solutions(solutions(build(puz), s, cuts),
+                                lambda soln: show(puz, soln))
+        answered = s.answered
+        if cache and answered:
+            cache.put(solns)
+    finish(solns, answered)
+    return solns
+
+def cover_solutions(cover, decode):
+    """Yields up to MAX_SOLUTIONS solutions of an exact cover, each
+    decoded from the names of its rows by decode(rows). decode returns
+    None for a solution that only repeats another by symmetry."""
+    soln_count = 0
+    start = time.time()
+    for rows in cover.solutions():
+        soln = decode(rows)
+        if soln is None:
+            continue
+        gridstats.solved({'vars': len(cover.rows), 'rules': len(cover.names),
+                          'seconds': time.time() - start, 'result': True})
+        yield soln
+        soln_count += 1
+        if soln_count >= MAX_SOLUTIONS:
+            return
+        start = time.time()
+    gridstats.solved({'vars': len(cover.rows), 'rules': len(cover.names),
+                      'seconds': time.time() - start, 'result': False})
+
+def solve_cover(cover, decode, show):
+    """Solves an exactcover.ExactCover with dancing links, printing
+    the solutions as solve_loop does. decode(rows) turns the names of
+    the rows in a solution into the solution that show(soln) prints."""
+    gridstats.built()
+    gridstats.stats['backend'] = 'dlx'
+    print 'Solving', len(cover.rows), 'rows,', len(cover.names), \
+        'columns with dancing links'
+    print
+    solns = print_solutions(cover_solutions(cover, decode), show)
+    if len(solns) < MAX_SOLUTIONS:
+        print 'No other solutions'
+        print
+    finish(solns, True)
+    return solns
+
+def solve_one(solve_grid, n, text):
+    """Solves the n'th grid of a batch, from a fresh claspy."""
+    claspy.reset()
+    gridstats.reset()
+    print 'Grid %d:' % n
+    jsonout.document(n)
+    try:
+        solve_grid(read_grid(text))
+    except SystemExit, e:  # the solver rejected the grid
+        if e.code is not None and not isinstance(e.code, int):
+            print >>sys.stderr, e.code
+            jsonout.error('invalid_input', str(e.code))
+    except Exception:
+        traceback.print_exc()
+        jsonout.error('exception',
+                      traceback.format_exc().strip().split('\n')[-1])
+    jsonout.end()
+    print
+
+batch_solver = None  # solve_grid, for the pool workers
+
+def solve_captured(job):
+    return jsonout.capture(solve_one, batch_solver, *job)
+
+def run(solve_grid):
+    """Solves the grid on stdin with solve_grid(puz), or each grid of a
+    batch, reporting how many were solved per second."""
+    global batch_solver
+    jsonout.start()
+    text = sys.stdin.read()
+    grids = split_grids(text)
+    if len(grids) <= 1:
+        solve_grid(read_grid(text))
+        return
+    start = time.time()
+    if BATCH_WORKERS > 1:
+        batch_solver = solve_grid
+        pool = multiprocessing.Pool(BATCH_WORKERS)
+        for out in pool.imap(solve_captured, enumerate(grids, 1)):
+            jsonout.write(out)
+        pool.close()
+        pool.join()
+    else:
+        for n, grid in enumerate(grids, 1):
+            solve_one(solve_grid, n, grid)
+    seconds = time.time() - start
+    jsonout.document(None)
+    print 'Solved %d grids in %.2f seconds, %.1f per second' % \
+        (len(grids), seconds, len(grids) / seconds)
+    jsonout.result('ok', grids=len(grids), seconds=seconds,
+                   per_second=len(grids) / seconds)
@@ -0,0 +1,79 @@
+
+# http://tools.qhex.org/
+#
+# Where a claspy solver spends its time: parsing the input, building
+# the model in python, emitting it to clasp, clasp's search for each
+# solution, and printing the solutions, along with the size of the
+# model. Setting QHEX_STATS to a file name appends the statistics of
+# each run to it as a line of JSON. The normal output is unchanged.
+
+import os
+import re
+import sys
+import json
+import time
+
+def reset():
+    """Starts the statistics of a new run."""
+    global start, last
+    start = last = time.time()
+    stats.clear()
+    stats.update({'tool': os.path.basename(sys.argv[0]).split('.')[0],
+                  'startup': None, 'parse': None, 'build': None,
+                  'solves': [], 'show': 0.0})
+
+stats = {}
+reset()
+
+def lap():
+    """Returns the time since the last lap."""
+    global last
+    now = time.time()
+    seconds = now - last
+    last = now
+    return seconds
+
+def parsed(puz, parse_start):
+    """Records the input parsed since parse_start, and the time spent
+    importing modules before then."""
+    stats['startup'] = parse_start - start
+    lap()
+    stats['parse'] = last - parse_start
+    stats['height'], stats['width'] = len(puz), len(puz[0])
+
+def built():
+    """Marks the end of building the model, at the first solve."""
+    if stats['build'] is None:
+        stats['build'] = lap()
+
+def clasp_stats(text):
+    """Reads the statistics that clasp prints."""
+    result = {}
+    for key, pattern in (('clasp', r'\nTime\s*:\s*([\d.]+)s'),
+                         ('search', r'\(Solving:\s*([\d.]+)s'),
+                         ('atoms', r'\nAtoms\s*:\s*(\d+)'),
+                         ('constraints', r'\nConstraints\s*:\s*(\d+)')):
+        m = re.search(pattern, text)
+        if m:
+            result[key] = float(m.group(1)) if '.' in m.group(1) \
+                          else int(m.group(1))
+    return result
+
+def solved(solve):
+    """Records one solve, a dict with the model size and times."""
+    stats['solves'].append(solve)
+
+def shown(seconds):
+    stats['show'] += seconds
+
+def write():
+    path = os.environ.get('QHEX_STATS')
+    if not path:
+        return
+    stats['total'] = time.time() - start
+    try:
+        f = open(path, 'a')
+        f.write(json.dumps(stats, sort_keys=True) + '\n')
+        f.close()
+    except IOError:
+        pass  # statistics are optional
@@ -4,81 +4,114 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
 
-set_max_val(width*height-1)
-
-def cell(r,c):
-    if puz[r][c] == '`':
-        options = ['`']
-        if r != 0 and r != height-1:
-            options.append('|')
-            options.append('||')
-        if c != 0 and c != width-1:
-            options.append('-')
-            options.append('=')
-        return MultiVar(*options)
-    else:
-        return MultiVar(int(puz[r][c]))
-
-grid = [[cell(r,c) for c in range(width)] for r in range(height)]
-
-def is_int(xvar):
-    return xvar.boolean_op(lambda a,b: type(a) is int, None)
-
-# require vertical lines to connect
-for r,c in nrange(height-1, width):
-    require(cond(grid[r][c] == '|', (grid[r+1][c] == '|') | is_int(grid[r+1][c]), True))
-    require(cond(grid[r+1][c] == '|', (grid[r][c] == '|') | is_int(grid[r][c]), True))
-    require(cond(grid[r][c] == '||', (grid[r+1][c] == '||') | is_int(grid[r+1][c]), True))
-    require(cond(grid[r+1][c] == '||', (grid[r][c] == '||') | is_int(grid[r][c]), True))
-
-# require horizontal lines to connect
-for r,c in nrange(height, width-1):
-    require(cond(grid[r][c] == '-', (grid[r][c+1] == '-') | is_int(grid[r][c+1]), True))
-    require(cond(grid[r][c+1] == '-', (grid[r][c] == '-') | is_int(grid[r][c]), True))
-    require(cond(grid[r][c] == '=', (grid[r][c+1] == '=') | is_int(grid[r][c+1]), True))
-    require(cond(grid[r][c+1] == '=', (grid[r][c] == '=') | is_int(grid[r][c]), True))
-
-# require sum of connections to match
-for r,c in nrange(height, width):
-    if puz[r][c] == '`':
-        continue
-    total = IntVar(0)
-    if c > 0: total += cond(grid[r][c-1] == '-', 1, 0)
-    if c < width-1: total += cond(grid[r][c+1] == '-', 1, 0)
-    if c > 0: total += cond(grid[r][c-1] == '=', 2, 0)
-    if c < width-1: total += cond(grid[r][c+1] == '=', 2, 0)
-    if r > 0: total += cond(grid[r-1][c] == '|', 1, 0)
-    if r < height-1: total += cond(grid[r+1][c] == '|', 1, 0)
-    if r > 0: total += cond(grid[r-1][c] == '||', 2, 0)
-    if r < height-1: total += cond(grid[r+1][c] == '||', 2, 0)
-    require(total == grid[r][c])
-
-def valid_vgrad(xvar):
-    return xvar.boolean_op(lambda a,b: a == '|' or a == '||' or type(a) is int, None)
-def valid_hgrad(xvar):
-    return xvar.boolean_op(lambda a,b: a == '-' or a == '=' or type(a) is int, None)
-
-# require connectivity
-source = MultiVar(*nrange(height,width))
-c_grid = [[Atom() for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    c_grid[r][c].prove_if(source == (r,c))
-    if c > 0:
-        c_grid[r][c].prove_if(valid_hgrad(grid[r][c]) & valid_hgrad(grid[r][c-1]) & c_grid[r][c-1])
-    if c < width-1:
-        c_grid[r][c].prove_if(valid_hgrad(grid[r][c]) & valid_hgrad(grid[r][c+1]) & c_grid[r][c+1])
-    if r > 0:
-        c_grid[r][c].prove_if(valid_vgrad(grid[r][c]) & valid_vgrad(grid[r-1][c]) & c_grid[r-1][c])
-    if r < height-1:
-        c_grid[r][c].prove_if(valid_vgrad(grid[r][c]) & valid_vgrad(grid[r+1][c]) & c_grid[r+1][c])
-    require(cond(grid[r][c] != '`', c_grid[r][c], True))
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    pgrid = tmap(str, grid)
+class Cell(object):
+    """A cell that bridges may cross, shown by the bridge across it or
+    down through it, if any. across and down are the variables of the
+    bridges that can cross it, or None."""
+    def __init__(self):
+        self.across = None
+        self.down = None
+
+    def symbols(self):
+        result = {}
+        if self.across is not None:
+            result['-'] = self.across == 1
+            result['='] = self.across == 2
+        if self.down is not None:
+            result['|'] = self.down == 1
+            result['||'] = self.down == 2
+        return result
+
+    def __eq__(self, x):
+        symbols = self.symbols()
+        if x == '`':
+            return reduce(lambda a,b: a & b, map(lambda v: ~v, symbols.values()),
+                          BoolVar(True))
+        return symbols.get(x, BoolVar(False))
+
+    def value(self):
+        for x, var in self.symbols().items():
+            if var.value():
+                return x
+        return '`'
+
+def build(puz):
+    height, width = len(puz), len(puz[0])
+
+    set_max_val(8)
+
+    islands = [(r,c) for r,c in nrange(height, width) if puz[r][c] != '`']
+    for r,c in islands:
+        # an island has at most 2 bridges on each of its 4 sides
+        if puz[r][c] not in map(str, range(1, 9)):
+            print 'Island clues must be from 1 to 8, not %s.' % puz[r][c]
+            sys.exit()
+    number = dict((island, i) for i, island in enumerate(islands))
+    grid = [[int(puz[r][c]) if puz[r][c] != '`' else '`'
+             for c in range(width)] for r in range(height)]
+
+    # a bridge can join each island to the next one to the right and
+    # below, with 0, 1 or 2 lines, as long as there are cells between
+    bridges = []  # (island, island, variable)
+    touching = []  # islands next to each other, which count as connected
+    for r,c in islands:
+        for dr, dc in ((0,1), (1,0)):
+            r2, c2 = r+dr, c+dc
+            between = []
+            while r2 < height and c2 < width and puz[r2][c2] == '`':
+                between.append((r2,c2))
+                r2, c2 = r2+dr, c2+dc
+            if r2 == height or c2 == width:
+                continue
+            if not between:
+                touching.append((number[(r,c)], number[(r2,c2)]))
+                continue
+            bridge = IntVar(0, 2)
+            bridges.append((number[(r,c)], number[(r2,c2)], bridge))
+            for r3,c3 in between:
+                if grid[r3][c3] == '`':
+                    grid[r3][c3] = Cell()
+                if dc:
+                    grid[r3][c3].across = bridge
+                else:
+                    grid[r3][c3].down = bridge
+    print len(islands), 'islands,', len(bridges), 'possible bridges'
+
+    # require bridges not to cross
+    for row in grid:
+        for cell in row:
+            if isinstance(cell, Cell) and cell.across is not None and \
+                    cell.down is not None:
+                require((cell.across == 0) | (cell.down == 0))
+
+    # require sum of bridges to match
+    total = [IntVar(0) for island in islands]
+    for i, j, bridge in bridges:
+        total[i] += bridge
+        total[j] += bridge
+    for i, (r,c) in enumerate(islands):
+        require(total[i] == int(puz[r][c]))
+
+    # require connectivity, from the first island
+    reached = [Atom() for island in islands]
+    if islands:
+        reached[0].prove_if(BoolVar(True))
+    for i, j, bridge in bridges:
+        reached[i].prove_if((bridge != 0) & reached[j])
+        reached[j].prove_if((bridge != 0) & reached[i])
+    for i, j in touching:
+        reached[i].prove_if(reached[j])
+        reached[j].prove_if(reached[i])
+    for atom in reached:
+        require(atom)
+
+    return grid
+
+def show(puz, soln):
+    height, width = len(puz), len(puz[0])
+    pgrid = tmap(str, soln)
     pgrid = tmap(lambda x: '===' if x == '=' else x, pgrid)
     pgrid = tmap(lambda x: '---' if x == '-' else x, pgrid)
     pgrid = tmap(lambda x: '|| ' if x == '||' else x, pgrid)
@@ -88,12 +121,13 @@ while solve():
     for row in pgrid:
         print ''.join(map(lambda val, width: str(val).center(width),
                           row, widths))
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for r,c in nrange(height, width):
-        x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+
+# bridges change direction when the grid is transposed
+transpose_bridges = {'-': '|', '|': '-', '=': '||', '||': '='}
+
+def solve_grid(puz):
+    solve_puzzle(puz, build, show,
+                 Symmetry(ALL, soln_maps=(transpose_bridges, None, None)))
+
+if __name__ == '__main__':
+    run(solve_grid)
@@ -3,6 +3,7 @@
 # http://tools.qhex.org/
 
 import sys
+import jsonout
 
 def all_counts(lst):
     '''Prints a histogram of the input elements, sorted by element.'''
@@ -112,6 +113,7 @@ def substring_counts(tree):
 
 ##################
 
+jsonout.start()
 input_str = sys.stdin.read()
 print 'length:', len(input_str)
 print
@@ -151,3 +153,4 @@ for i in range(len(substrings)):
     if True not in [s in prev_s and cnt == prev_cnt for (prev_s, prev_cnt) in prev_substrings]:
         print repr(s), cnt, '#' * cnt
         prev_substrings.append((s, cnt))
+jsonout.result('ok', length=len(input_str))
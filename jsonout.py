@@ -0,0 +1,157 @@
+
+# http://tools.qhex.org/
+#
+# Machine readable output. Given --json on the command line, or
+# QHEX_JSON=1, a tool prints lines of JSON in place of its normal
+# output, so gridpuzzle and format don't have to scrape the text.
+#
+# The normal output is still passed on as it is printed, a line at a
+# time, as {"line": ...}. Solvers also print a line {"solution": ...,
+# "text": ...} for each solution as it is found. Every tool ends with one line holding a
+# "status": "unique", "multiple" or "none" for solvers, "ok" for the
+# other tools, or "error" with an error "code" and a "message", along
+# with the normal "output" that was held back.
+
+import sys
+import os
+import json
+import atexit
+import traceback
+from StringIO import StringIO
+
+state = {'out': None, 'done': False, 'tag': {}}
+
+class Held(StringIO):
+    """The normal output held back, which is also sent on a line at a
+    time."""
+    def __init__(self):
+        StringIO.__init__(self)
+        self.partial = ''
+    def write(self, s):
+        StringIO.write(self, s)
+        lines = (self.partial + s).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            emit({'line': line + '\n'})
+    def flush(self):
+        if self.partial:
+            emit({'line': self.partial})
+            self.partial = ''
+
+def enabled():
+    return '--json' in sys.argv[1:] or os.environ.get('QHEX_JSON') == '1'
+
+def start():
+    """In JSON mode, holds back the normal output, and makes sure a
+    status line is printed when the tool exits."""
+    if not enabled() or state['out'] is not None:
+        return
+    state['out'] = sys.stdout
+    state['done'] = False
+    sys.stdout = Held()
+    if not state.get('registered'):
+        atexit.register(finish)
+        sys.excepthook = excepthook
+        state['registered'] = True
+
+def text():
+    """The normal output held back so far."""
+    if state['out'] is None:
+        return ''
+    return sys.stdout.getvalue()
+
+def decode(x):
+    """Makes the strings in x unicode, replacing bytes that aren't
+    UTF-8, so that any output a tool printed can be dumped."""
+    if type(x) is str:
+        return x.decode('utf-8', 'replace')
+    if type(x) in (list, tuple):
+        return map(decode, x)
+    if type(x) is dict:
+        return dict((decode(k), decode(v)) for k, v in x.items())
+    return x
+
+def emit(obj):
+    if state['out'] is None:
+        return
+    obj = decode(dict(state['tag'], **obj))
+    state['out'].write(json.dumps(obj, default=lambda x: decode(str(x))) +
+                       '\n')
+    state['out'].flush()
+
+def write(s):
+    """Writes output that is already in the right form."""
+    (state['out'] or sys.stdout).write(s)
+
+def capture(f, *args):
+    """Calls f, returning what it prints, as JSON in JSON mode."""
+    buf = StringIO()
+    if state['out'] is None:
+        stdout, sys.stdout = sys.stdout, buf
+        try:
+            f(*args)
+        finally:
+            sys.stdout = stdout
+    else:
+        out, state['out'] = state['out'], buf
+        try:
+            f(*args)
+        finally:
+            state['out'] = out
+    return buf.getvalue()
+
+def solution(soln, text):
+    emit({'solution': soln, 'text': text})
+
+def result(status, **fields):
+    """Prints the status line."""
+    if state['out'] is None or state['done']:
+        return
+    state['done'] = True  # even if emit fails, so it isn't tried again
+    sys.stdout.flush()
+    fields['status'] = status
+    fields.setdefault('output', text())
+    emit(fields)
+
+def error(code, message):
+    result('error', code=code, message=message)
+
+def excepthook(t, value, tb):
+    try:
+        error('exception',
+              traceback.format_exception_only(t, value)[-1].strip())
+    except Exception:
+        pass  # the traceback below still says what went wrong
+    sys.__excepthook__(t, value, tb)
+
+def end():
+    """Prints an error if there is no status yet."""
+    if state['out'] is None or state['done']:
+        return
+    message = text().strip()
+    if message:  # the tool explained itself, then exited
+        error('invalid_input', message)
+    else:
+        error('failed', 'no result')
+
+def document(n):
+    """Starts the output for the n'th grid of a batch. Each line is
+    tagged with "grid": n, and each grid has its own status line. With
+    n None, starts the summary of the whole batch."""
+    if state['out'] is None:
+        return
+    state['tag'] = {} if n is None else {'grid': n}
+    state['done'] = False
+    sys.stdout = Held()
+
+def finish():
+    """Prints an error if the tool exits without a status, then goes
+    back to normal output."""
+    if state['out'] is None:
+        return
+    try:
+        end()
+    finally:
+        sys.stdout = state['out']
+        state['out'] = None
+        state['tag'] = {}
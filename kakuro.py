@@ -4,54 +4,123 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
 from copy import deepcopy
+import itertools
+import gridstats
 
-if sum('\\' in x and x != '\\'
-       for x in reduce(lambda a,b: a+b, puz)) < (width+height)/2:
-    print 'Not enough givens for kakuro of size %d x %d.' % (width,height)
-    sys.exit()
-
-grid = deepcopy(puz)
-for r,c in nrange(height, width):
-    if puz[r][c] == '`':
-        grid[r][c] = IntVar(1,9)
-
-for r,c in nrange(height, width):
-    if '\\' not in puz[r][c]: continue
-    down_val, right_val = puz[r][c].split('\\')
-    if right_val:
-        cells = []
-        c1 = c+1
-        while c1 < width and puz[r][c1] == '`':
-            cells.append(grid[r][c1])
-            c1 += 1
-        require(sum_vars(cells) == int(right_val))
-        require_all_diff(cells)
-    if down_val:
-        cells = []
-        r1 = r+1
-        while r1 < height and puz[r1][c] == '`':
-            cells.append(grid[r1][c])
-            r1 += 1
-        require(sum_vars(cells) == int(down_val))
-        require_all_diff(cells)
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    widths = [max([len(str(row[c])) for row in grid])
+# (total, length) -> each set of distinct digits with that total
+combinations = {}
+for n in range(1, 10):
+    for digits in itertools.combinations(range(1, 10), n):
+        combinations.setdefault((sum(digits), n), []).append(set(digits))
+
+def runs(puz):
+    """Returns (cells, total) for the run of cells after each clue."""
+    g = Grid(puz)
+    result = []
+    # the clue before a row run gives its right sum, before a column
+    # run its down sum
+    for lines, dr, dc, side in ((g.rows, 0, 1, 1), (g.cols, 1, 0, 0)):
+        for cells in g.runs(lambda x: x != '`', lines):
+            r, c = cells[0][0] - dr, cells[0][1] - dc
+            if r < 0 or c < 0 or '\\' not in puz[r][c]: continue
+            val = puz[r][c].split('\\')[side]
+            if val:
+                result.append((cells, int(val)))
+    return result
+
+def prune(runs, domain):
+    """Removes digits from the cells' domains that no combination of
+    digits for a run allows, until nothing changes. Returns the
+    combinations left for each run, or None if a run has none."""
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for cells, total in runs:
+            doms = [domain[x] for x in cells]
+            fixed = [min(d) for d in doms if len(d) == 1]
+            if len(set(fixed)) < len(fixed):
+                return None
+            allowed = [combo for combo in
+                       combinations.get((total, len(cells)), [])
+                       if all(d & combo for d in doms) and
+                       set(fixed) <= combo <= reduce(set.union, doms)]
+            if not allowed:
+                return None
+            digits = reduce(set.union, allowed)
+            for x in cells:
+                new = domain[x] & digits
+                if len(new) > 1:
+                    new -= set(fixed)  # each digit is used once
+                if not new:
+                    return None
+                if new != domain[x]:
+                    domain[x] = new
+                    changed = True
+            result.append(allowed)
+    return result
+
+def build(puz):
+    height, width = len(puz), len(puz[0])
+
+    if sum('\\' in x and x != '\\'
+           for x in reduce(lambda a,b: a+b, puz)) < (width+height)/2:
+        print 'Not enough givens for kakuro of size %d x %d.' % (width,height)
+        sys.exit()
+
+    clues = runs(puz)
+    white = [(r,c) for r,c in nrange(height, width) if puz[r][c] == '`']
+    domain = dict((x, set(range(1, 10))) for x in white)
+    allowed = prune(clues, domain)
+    if allowed is None:  # contradictory clues, left for the solver to report
+        domain = dict((x, set(range(1, 10))) for x in white)
+        allowed = [combinations.get((total, len(cells)), [])
+                   for cells, total in clues]
+    else:
+        gridstats.stats['propagation'] = {
+            'fixed': sum(len(d) == 1 for d in domain.values()),
+            'candidates': sum(map(len, domain.values()))}
+
+    grid = deepcopy(puz)
+    for x in white:
+        grid[x[0]][x[1]] = MultiVar(*sorted(domain[x]))
+
+    # each run holds one of its combinations of digits, each digit once
+    for (cells, total), combos in zip(clues, allowed):
+        if not combos:
+            require(BoolVar(False))
+            continue
+        used = {}
+        for d in reduce(set.union, [domain[x] for x in cells]):
+            holding = [grid[r][c] == d for r,c in cells if d in domain[(r,c)]]
+            require(at_most(1, holding))
+            used[d] = at_least(1, holding)
+        require(reduce(lambda a,b: a|b,
+                       [reduce(lambda a,b: a&b,
+                               [used.get(d, BoolVar(False)) for d in combo])
+                        for combo in combos]))
+
+    return grid
+
+def show(puz, soln):
+    height = len(puz)
+    widths = [max([len(str(row[c])) for row in soln])
               for c in range(height)]
-    for row in grid:
+    for row in soln:
         print ' '.join(map(lambda val, width: str(val).center(width),
                            row, widths))
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for r,c in nrange(height, width):
-        if puz[r][c] == '`':
-            x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+
+def transpose_clue(x):
+    """Swaps the down and right sums of a clue."""
+    if type(x) is str and '\\' in x:
+        return '\\'.join(x.split('\\')[::-1])
+    return x
+
+def solve_grid(puz):
+    maps = (transpose_clue, None, None)
+    solve_puzzle(puz, build, show, Symmetry(TRANSPOSE, maps, maps))
+
+if __name__ == '__main__':
+    run(solve_grid)
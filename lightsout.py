@@ -4,31 +4,31 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
 
-grid = [[BoolVar() for c in range(width)] for r in range(height)]
+def build(puz):
+    height, width = len(puz), len(puz[0])
 
-for r,c in nrange(height, width):
-    if puz[r][c] not in ('#', '`'):
-        sys.exit('unrecognized character: %s' % puz[r][c])
+    g = Grid(puz)
+    grid = [[BoolVar() for c in range(width)] for r in range(height)]
+
+    for r,c in nrange(height, width):
+        if puz[r][c] not in ('#', '`'):
+            sys.exit('unrecognized character: %s' % puz[r][c])
 
-for r,c in nrange(height, width):
-    result = BoolVar(puz[r][c] != '`')
-    for r1,c1 in ((r,c),(r,c-1),(r,c+1),(r-1,c),(r+1,c)):
-        if r1 >= 0 and r1 < height and c1 >= 0 and c1 < width:
-            result ^= grid[r1][c1]
-    require(~result)
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    p(tmap(lambda g,p: '#' if g.value() else '`', grid, puz))
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
     for r,c in nrange(height, width):
-        x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+        result = BoolVar(puz[r][c] != '`')
+        for r1,c1 in [(r,c)] + g.orthogonal[r][c]:
+            result ^= grid[r1][c1]
+        require(~result)
+
+    return grid
+
+def show(puz, soln):
+    p(tmap(lambda g,p: '#' if g else '`', soln, puz))
+
+def solve_grid(puz):
+    solve_puzzle(puz, build, show, Symmetry(ALL))
+
+if __name__ == '__main__':
+    run(solve_grid)
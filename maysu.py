@@ -4,133 +4,161 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
 
-for r,c in nrange(height, width):
-    if puz[r][c] not in ('x', 'o', '`'):
-        sys.exit('unrecognized character: %s' % puz[r][c])
-
-grid = [[MultiVar('`','<','>','^','v') for c in range(width)]
-        for r in range(height)]
-
-# require one incoming connection to every point on the path
-for r,c in nrange(height, width):
-    incoming = []
-    if r > 0: incoming.append(grid[r-1][c] == 'v')
-    if r < height-1: incoming.append(grid[r+1][c] == '^')
-    if c > 0: incoming.append(grid[r][c-1] == '>')
-    if c < width-1: incoming.append(grid[r][c+1] == '<')
-    require(cond(grid[r][c] == '`',
-                 at_most(0, incoming),
-                 sum_bools(1, incoming)))
-
-# require no elemnts pointing at each other
-for r,c in nrange(height-1, width):
-    require(~((grid[r][c] == 'v') & (grid[r+1][c] == '^')))
-for r,c in nrange(height, width-1):
-    require(~((grid[r][c] == '>') & (grid[r][c+1] == '<')))
-
-# require straight path for 'o' and turn for 'x'
-for r,c in nrange(height, width):
-    if puz[r][c] != '`':
-        require(grid[r][c] != '`')
-    if puz[r][c] == 'o':
-        if r > 0: require(cond(grid[r][c] == 'v', grid[r-1][c] == 'v', True))
-        else: require(grid[r][c] != 'v')
-        if r < height-1: require(cond(grid[r][c] == '^', grid[r+1][c] == '^', True))
-        else: require(grid[r][c] != '^')
-        if c > 0: require(cond(grid[r][c] == '>', grid[r][c-1] == '>', True))
-        else: require(grid[r][c] != '>')
-        if c < height-1: require(cond(grid[r][c] == '<', grid[r][c+1] == '<', True))
-        else: require(grid[r][c] != '<')
-    if puz[r][c] == 'x':
-        if r > 0: require(cond(grid[r][c] == 'v', grid[r-1][c] != 'v', True))
-        if r < height-1: require(cond(grid[r][c] == '^', grid[r+1][c] != '^', True))
-        if c > 0: require(cond(grid[r][c] == '>', grid[r][c-1] != '>', True))
-        if c < height-1: require(cond(grid[r][c] == '<', grid[r][c+1] != '<', True))
-# loop must turn next to 'o'
-for r,c in nrange(height-3, width):
-    if puz[r+2][c] == 'o':
-        require(~((grid[r][c] == 'v') &
-                  (grid[r+1][c] == 'v') &
-                  (grid[r+2][c] == 'v') &
-                  (grid[r+3][c] == 'v')))
-    if puz[r+1][c] == 'o':
-        require(~((grid[r][c] == '^') &
-                  (grid[r+1][c] == '^') &
-                  (grid[r+2][c] == '^') &
-                  (grid[r+3][c] == '^')))
-for r,c in nrange(height, width-3):
-    if puz[r][c+2] == 'o':
-        require(~((grid[r][c] == '>') &
-                  (grid[r][c+1] == '>') &
-                  (grid[r][c+2] == '>') &
-                  (grid[r][c+3] == '>')))
-    if puz[r][c+1] == 'o':
-        require(~((grid[r][c] == '<') &
-                  (grid[r][c+1] == '<') &
-                  (grid[r][c+2] == '<') &
-                  (grid[r][c+3] == '<')))
-# loop must be straight next to 'x'
-for r in range(height):
-    if puz[r][1] == 'x': require(grid[r][0] != '>')
-    if puz[r][-2] == 'x': require(grid[r][-1] != '<')
-for c in range(width):
-    if puz[1][c] == 'x': require(grid[0][c] != 'v')
-    if puz[-2][c] == 'x': require(grid[-1][c] != '^')
-# incoming
-for r,c in nrange(height-2, width):
-    if puz[r+2][c] == 'x': require(cond(grid[r+1][c] == 'v', grid[r][c] == 'v', True))
-    if puz[r][c] == 'x': require(cond(grid[r+1][c] == '^', grid[r+2][c] == '^', True))
-for r,c in nrange(height, width-2):
-    if puz[r][c+2] == 'x': require(cond(grid[r][c+1] == '>', grid[r][c] == '>', True))
-    if puz[r][c] == 'x': require(cond(grid[r][c+1] == '<', grid[r][c+2] == '<', True))
-# outgoing
-for r,c in nrange(height-1, width):
-    if puz[r][c] == 'x': require(cond(grid[r][c] == 'v', grid[r+1][c] == 'v', True))
-    if puz[r+1][c] == 'x': require(cond(grid[r+1][c] == '^', grid[r][c] == '^', True))
-for r,c in nrange(height, width-1):
-    if puz[r][c] == 'x': require(cond(grid[r][c] == '>', grid[r][c+1] == '>', True))
-    if puz[r][c+1] == 'x': require(cond(grid[r][c+1] == '<', grid[r][c] == '<', True))
-
-# require connectivity along path
-c_grid = [[Atom() for c in range(width)] for r in range(height)]
-for r,c in nrange(height-1, width):
-    c_grid[r][c].prove_if(c_grid[r+1][c] & (grid[r+1][c] == '^'))
-    c_grid[r+1][c].prove_if(c_grid[r][c] & (grid[r][c] == 'v'))
-for r,c in nrange(height, width-1):
-    c_grid[r][c].prove_if(c_grid[r][c+1] & (grid[r][c+1] == '<'))
-    c_grid[r][c+1].prove_if(c_grid[r][c] & (grid[r][c] == '>'))
-# the first x/o is proven
-for r,c in nrange(height, width):
-    if puz[r][c] != '`':
-        c_grid[r][c].prove_if(True)
-        break
-for r,c in nrange(height, width):
-    require(cond(grid[r][c] != '`', c_grid[r][c], True))
-
-# break symmetry for direction
-for r,c in nrange(height, width):
-    if puz[r][c] == 'o':
-        require((grid[r][c] == '>') | (grid[r][c] == 'v'))
-        break
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
+STEPS = dict((d, (dr, dc)) for d, dr, dc in DIRECTIONS)
+
+class Loop(object):
+    """The loop through the grid, from the variables of the edges
+    between neighboring cells. Its value is the grid of the direction
+    the loop leaves each cell, going one way around each cycle."""
+    def __init__(self, puz):
+        self.puz = puz
+        height, width = len(puz), len(puz[0])
+        self.edges = {}  # (cell, cell) -> BoolVar, the first cell first
+        for r,c in nrange(height, width):
+            if c < width-1: self.edges[((r,c), (r,c+1))] = BoolVar()
+            if r < height-1: self.edges[((r,c), (r+1,c))] = BoolVar()
+
+    def edge(self, a, b):
+        """The variable of the edge between cells a and b, or False if
+        either is off the grid."""
+        return self.edges.get((min(a, b), max(a, b)), BoolVar(False))
+
+    def cycles(self, used):
+        """The cycles of the used edges, each a list of cells in order,
+        going right from its first cell."""
+        links = {}
+        for a, b in used:
+            links.setdefault(a, []).append(b)
+            links.setdefault(b, []).append(a)
+        result = []
+        seen = set()
+        for start in sorted(links):
+            if start in seen: continue
+            cycle = [start]
+            prev, cell = start, min(links[start])
+            while cell != start:
+                cycle.append(cell)
+                prev, cell = cell, [x for x in links[cell] if x != prev][0]
+            seen.update(cycle)
+            result.append(cycle)
+        return result
+
+    def used(self):
+        return [edge for edge, var in self.edges.items() if var.value()]
+
+    def value(self):
+        height, width = len(self.puz), len(self.puz[0])
+        soln = [['`' for c in range(width)] for r in range(height)]
+        # go out of the first o to the right or down, as the cache and
+        # the old model did
+        first = [(r,c) for r,c in nrange(height, width)
+                 if self.puz[r][c] == 'o'][:1]
+        for cycle in self.cycles(self.used()):
+            if first and first[0] in cycle:
+                i = cycle.index(first[0])
+                if cycle[i-1] > cycle[i]:
+                    cycle.reverse()
+            for (r,c), (r2,c2) in zip(cycle, cycle[1:] + cycle[:1]):
+                soln[r][c] = [d for d, step in STEPS.items()
+                              if step == (r2-r, c2-c)][0]
+        return soln
+
+    def __eq__(self, soln):
+        """Whether the edges are those of a solution."""
+        result = BoolVar(True)
+        for ((r,c), (r2,c2)), var in sorted(self.edges.items()):
+            used = STEPS.get(soln[r][c]) == (r2-r, c2-c) or \
+                   STEPS.get(soln[r2][c2]) == (r-r2, c-c2)
+            result = result & (var if used else ~var)
+        return result
+
+def build(puz):
+    height, width = len(puz), len(puz[0])
+
+    for r,c in nrange(height, width):
+        if puz[r][c] not in ('x', 'o', '`'):
+            sys.exit('unrecognized character: %s' % puz[r][c])
+
+    loop = Loop(puz)
+    def edge(r, c, dr, dc):
+        return loop.edge((r,c), (r+dr,c+dc))
+
+    # each cell is on the loop, with two edges, or not, with none
+    for r,c in nrange(height, width):
+        edges = [edge(r, c, dr, dc) for d, dr, dc in DIRECTIONS]
+        if puz[r][c] == '`':
+            require(at_most(0, edges) | sum_bools(2, edges))
+        else:
+            require(sum_bools(2, edges))
+
+    for r,c in nrange(height, width):
+        up, down = edge(r, c, -1, 0), edge(r, c, 1, 0)
+        left, right = edge(r, c, 0, -1), edge(r, c, 0, 1)
+        # the edges beyond the neighboring cells
+        up2, down2 = edge(r-1, c, -1, 0), edge(r+1, c, 1, 0)
+        left2, right2 = edge(r, c-1, 0, -1), edge(r, c+1, 0, 1)
+        if puz[r][c] == 'o':
+            # straight through, turning in a neighboring cell
+            require((left & right) | (up & down))
+            require(~(left & right) | ~left2 | ~right2)
+            require(~(up & down) | ~up2 | ~down2)
+        if puz[r][c] == 'x':
+            # turning, going straight through both neighboring cells
+            require(~(left & right) & ~(up & down))
+            require(~up | up2)
+            require(~down | down2)
+            require(~left | left2)
+            require(~right | right2)
+
+    # if there are no pearls, there is no loop
+    if not any(x != '`' for row in puz for x in row):
+        for var in loop.edges.values():
+            require(~var)
+
+    return loop
+
+def cuts(loop, soln):
+    """Rules out each cycle of a solution that leaves out a pearl: if
+    the loop uses an edge between its cells, it also uses one leaving
+    them. Connectivity is only added this way, as solutions break it."""
+    cycles = loop.cycles(loop.used())
+    if len(cycles) <= 1:
+        return []
+    height, width = len(loop.puz), len(loop.puz[0])
+    pearls = set((r,c) for r,c in nrange(height, width)
+                 if loop.puz[r][c] != '`')
+    rules = []
+    for cycle in cycles:
+        cells = set(cycle)
+        if pearls <= cells: continue
+        inside = [var for (a, b), var in loop.edges.items()
+                  if a in cells and b in cells]
+        leaving = [var for (a, b), var in loop.edges.items()
+                   if (a in cells) != (b in cells)]
+        rules.append(at_least(1, leaving) | ~at_least(1, inside))
+    return rules
+
+def show(puz, soln):
+    height, width = len(puz), len(puz[0])
     output = [['   ' if c%2 else ' ' for c in range(width*2)] for r in range(height*2)]
     for r,c in nrange(height, width):
       output[r*2][c*2] = puz[r][c]
-      if grid[r][c].value() == '>': output[r*2][c*2+1] = '---'
-      if grid[r][c].value() == '<': output[r*2][c*2-1] = '---'
-      if grid[r][c].value() == '^': output[r*2-1][c*2] = '|'
-      if grid[r][c].value() == 'v': output[r*2+1][c*2] = '|'
+      if soln[r][c] == '>': output[r*2][c*2+1] = '---'
+      if soln[r][c] == '<': output[r*2][c*2-1] = '---'
+      if soln[r][c] == '^': output[r*2-1][c*2] = '|'
+      if soln[r][c] == 'v': output[r*2+1][c*2] = '|'
     print '\n'.join([''.join(row) for row in output])
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for r,c in nrange(height, width):
-        x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+
+# how each transform changes the direction of the path
+direction_maps = ({'<': '^', '^': '<', '>': 'v', 'v': '>'},
+                  {'^': 'v', 'v': '^'},
+                  {'<': '>', '>': '<'})
+
+def solve_grid(puz):
+    solve_puzzle(puz, build, show, Symmetry(ALL, soln_maps=direction_maps),
+                 cuts)
+
+if __name__ == '__main__':
+    run(solve_grid)
@@ -4,80 +4,103 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
+import gridstats
+import connectivity
 
-max_val = max(map(lambda x: 0 if x == '`' else int(x),
-                  reduce(lambda a,b: a+b, puz)))
+def sources(puz):
+    """Returns the clues whose island may reach each cell, as cell
+    numbers (row*width + col). An island reaches the blank cells within
+    its clue's size along paths that touch no other clue."""
+    height, width = len(puz), len(puz[0])
+    g = Grid(puz)
+    result = [[set() for c in range(width)] for r in range(height)]
+    for r,c in nrange(height, width):
+        if puz[r][c] == '`': continue
+        n = r*width + c
+        result[r][c].add(n)
+        distance = {(r,c): 0}
+        frontier = [(r,c)]
+        for r1,c1 in frontier:
+            if distance[(r1,c1)] + 1 >= int(puz[r][c]): continue
+            for r2,c2 in g.orthogonal[r1][c1]:
+                if (r2,c2) in distance or puz[r2][c2] != '`': continue
+                if any(puz[r3][c3] != '`' and (r3,c3) != (r,c)
+                       for r3,c3 in g.orthogonal[r2][c2]):
+                    continue  # would join another clue's island
+                distance[(r2,c2)] = distance[(r1,c1)] + 1
+                result[r2][c2].add(n)
+                frontier.append((r2,c2))
+    return result
 
-set_max_val(width*height)
-grid = tmap(lambda x: BoolVar() if x == '`' else BoolVar(False), puz)
+def build(puz):
+    height, width = len(puz), len(puz[0])
 
-# create a flow field in empty cells towards each number
-flow = [[MultiVar('^','v','>','<','.') for c in range(width)] for r in range(height)]
-flow_c = [[Atom() for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    if puz[r][c] != '`':  # source
-        require(flow[r][c] == '.')
-        flow_c[r][c].prove_if(True)
-        continue
-    require((flow[r][c] == '.') == grid[r][c])
-    if r > 0:        flow_c[r][c].prove_if((flow[r][c] == '^') & ~grid[r-1][c] & flow_c[r-1][c])
-    if r < height-1: flow_c[r][c].prove_if((flow[r][c] == 'v') & ~grid[r+1][c] & flow_c[r+1][c])
-    if c > 0:        flow_c[r][c].prove_if((flow[r][c] == '<') & ~grid[r][c-1] & flow_c[r][c-1])
-    if c < width-1:  flow_c[r][c].prove_if((flow[r][c] == '>') & ~grid[r][c+1] & flow_c[r][c+1])
-    flow_c[r][c].prove_if(grid[r][c])
-    require(flow_c[r][c])
+    max_val = max(map(lambda x: 0 if x == '`' else int(x),
+                      reduce(lambda a,b: a+b, puz)))
 
-# count cells that are upstream in the flow
-upstream = [[IntVar(0,max_val) for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    upstream_count = IntVar(0)
-    if r > 0:        upstream_count += cond(flow[r-1][c] == 'v', upstream[r-1][c], 0)
-    if r < height-1: upstream_count += cond(flow[r+1][c] == '^', upstream[r+1][c], 0)
-    if c > 0:        upstream_count += cond(flow[r][c-1] == '>', upstream[r][c-1], 0)
-    if c < width-1:  upstream_count += cond(flow[r][c+1] == '<', upstream[r][c+1], 0)
-    require(upstream[r][c] == upstream_count + 1)
-    if puz[r][c] != '`':  # source
-        require(upstream[r][c] == int(puz[r][c]))
+    g = Grid(puz)
+    # upstream counts add up to 4 neighbors' counts
+    set_max_val(4*max_val + 1)
+    reach = sources(puz)
+    # cells that no island reaches are filled
+    grid = [[BoolVar(False) if puz[r][c] != '`' else
+             BoolVar() if reach[r][c] else BoolVar(True)
+             for c in range(width)] for r in range(height)]
+    gridstats.stats['propagation'] = {
+        'fixed': sum(puz[r][c] != '`' or not reach[r][c]
+                     for r,c in nrange(height, width)),
+        'candidates': sum(len(reach[r][c]) for r,c in nrange(height, width)
+                          if puz[r][c] == '`')}
 
-# require connectivity for filled cells
-source = MultiVar(*nrange(height,width))
-c_grid = [[Atom() for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    c_grid[r][c].prove_if(source == (r,c))
-    if c > 0: c_grid[r][c].prove_if(grid[r][c-1] & c_grid[r][c-1])
-    if c < width-1: c_grid[r][c].prove_if(grid[r][c+1] & c_grid[r][c+1])
-    if r > 0: c_grid[r][c].prove_if(grid[r-1][c] & c_grid[r-1][c])
-    if r < height-1: c_grid[r][c].prove_if(grid[r+1][c] & c_grid[r+1][c])
-    require(cond(grid[r][c], c_grid[r][c], True))
+    # create a flow field in empty cells towards each number
+    flow = [[MultiVar('^','v','>','<','.') for c in range(width)] for r in range(height)]
+    flow_c = [[Atom() for c in range(width)] for r in range(height)]
+    for r,c in nrange(height, width):
+        if puz[r][c] != '`':  # source
+            require(flow[r][c] == '.')
+            flow_c[r][c].prove_if(True)
+            continue
+        require((flow[r][c] == '.') == grid[r][c])
+        for d,r1,c1 in g.directions[r][c]:
+            flow_c[r][c].prove_if((flow[r][c] == d) & ~grid[r1][c1] & flow_c[r1][c1])
+        flow_c[r][c].prove_if(grid[r][c])
+        require(flow_c[r][c])
 
-# require no two groups to come in contact.
-# each group is identified by source cell number (row*width + col)
-group = [[IntVar(0,width*height) for c in range(width)] for r in range(height)]
-for r,c in nrange(height, width):
-    if puz[r][c] != '`':  # source
-        require(group[r][c] == r*width + c)
-# require vertically adjacent to have the same group
-for r,c in nrange(height-1, width):
-    require(cond(~grid[r][c] & ~grid[r+1][c], group[r][c] == group[r+1][c], True))
-# require horizontally adjacent to have the same group
-for r,c in nrange(height, width-1):
-    require(cond(~grid[r][c] & ~grid[r][c+1], group[r][c] == group[r][c+1], True))
+    # count cells that are upstream in the flow
+    upstream = [[IntVar(0,max_val) for c in range(width)] for r in range(height)]
+    for r,c in nrange(height, width):
+        upstream_count = IntVar(0)
+        for d,r1,c1 in g.directions[r][c]:
+            upstream_count += cond(flow[r1][c1] == OPPOSITE[d], upstream[r1][c1], 0)
+        require(upstream[r][c] == upstream_count + 1)
+        if puz[r][c] != '`':  # source
+            require(upstream[r][c] == int(puz[r][c]))
 
-# require no group of four filled cells
-for r,c in nrange(height-1, width-1):
-    require(~grid[r][c] | ~grid[r][c+1] | ~grid[r+1][c] | ~grid[r+1][c+1])
+    # require connectivity for filled cells
+    connectivity.require_connected(grid, g)
 
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    p(tmap(lambda g,p: '#' if g.value() else p, grid, puz))
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for r,c in nrange(height, width):
-        x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+    # require no two groups to come in contact.
+    # each group is identified by source cell number (row*width + col),
+    # out of the sources that reach it
+    group = [[MultiVar(*sorted(reach[r][c])) if reach[r][c] else None
+              for c in range(width)] for r in range(height)]
+    # require adjacent cells to have the same group
+    for (r,c), (r1,c1) in g.pairs:
+        if group[r][c] is None or group[r1][c1] is None: continue
+        require(cond(~grid[r][c] & ~grid[r1][c1], group[r][c] == group[r1][c1], True))
+
+    # require no group of four filled cells
+    for window in g.windows:
+        require(reduce(lambda a,b: a | b, [~grid[r][c] for r,c in window]))
+
+    return grid
+
+def show(puz, soln):
+    p(tmap(lambda g,p: '#' if g else p, soln, puz))
+
+def solve_grid(puz):
+    solve_puzzle(puz, build, show, Symmetry(ALL), connectivity.cuts())
+
+if __name__ == '__main__':
+    run(solve_grid)
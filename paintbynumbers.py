@@ -3,8 +3,13 @@
 # http://tools.qhex.org/
 
 from claspy import *
+from gridsolve import *
 import sys
+import jsonout
+import gridstats
+import automaton
 
+jsonout.start()
 puz = sys.stdin.read().strip()
 puz = '\n'.join(map(lambda line: line.strip(), puz.split('\n')))
 puz = puz.split('\n\n')
@@ -18,57 +23,131 @@ down = map(lambda line: map(int, filter(bool, line.split(' '))),
 
 width = len(down)
 height = len(across)
-set_max_val(max(width, height))
 
-grid = [[BoolVar() for c in range(width)] for r in range(height)]
+def line_solve(vals, line):
+    """Returns the line with every cell decided that is the same in all
+    the ways to place the clue numbers vals, or None if there are none.
+    line holds True for filled cells, False for empty ones and None for
+    undecided ones."""
+    blocks = [b for b in vals if b > 0]
+    n, k = len(line), len(blocks)
+    # each block is followed by an empty cell, so pad the line with one
+    can_fill = [x is not False for x in line] + [False]
+    can_empty = [x is not True for x in line] + [True]
+    # empties[i] is the number of cells before i that must be empty
+    empties = [0]
+    for x in can_fill:
+        empties.append(empties[-1] + (not x))
+    def fits(s, b):
+        """Whether block b can start at cell s, with the empty after it."""
+        return s + b <= n and empties[s + b] == empties[s] and can_empty[s + b]
+    # fwd[j][i]: the first i cells can hold the first j blocks
+    fwd = [[False] * (n + 2) for j in range(k + 1)]
+    fwd[0][0] = True
+    for i in range(n + 1):
+        for j in range(k + 1):
+            if not fwd[j][i]: continue
+            if can_empty[i]:
+                fwd[j][i + 1] = True
+            if j < k and fits(i, blocks[j]):
+                fwd[j + 1][i + blocks[j] + 1] = True
+    if not fwd[k][n + 1]:
+        return None
+    # bwd[j][i]: the cells from i on can hold the blocks from j on
+    bwd = [[False] * (n + 2) for j in range(k + 1)]
+    bwd[k][n + 1] = True
+    for i in range(n, -1, -1):
+        for j in range(k, -1, -1):
+            if can_empty[i] and bwd[j][i + 1]:
+                bwd[j][i] = True
+            elif j < k and fits(i, blocks[j]) and bwd[j + 1][i + blocks[j] + 1]:
+                bwd[j][i] = True
+    empty = [any(fwd[j][i] and bwd[j][i + 1] for j in range(k + 1))
+             and can_empty[i] for i in range(n + 1)]
+    filled = [0] * (n + 1)  # +1 where a possible block starts, -1 after
+    for j in range(k):
+        b = blocks[j]
+        for s in range(n):
+            if fwd[j][s] and fits(s, b) and bwd[j + 1][s + b + 1]:
+                filled[s] += 1
+                filled[s + b] -= 1
+                empty[s + b] = True
+    result = []
+    count = 0
+    for i in range(n):
+        count += filled[i]
+        if count > 0 and not empty[i]:
+            result.append(True)
+        elif empty[i] and count == 0:
+            result.append(False)
+        else:
+            result.append(line[i])
+    return result
 
-def cumsum(input):
-    x = 0
-    output = []
-    for i in input:
-        x += i
-        output.append(x)
-    return output
+def solve_lines():
+    """Line solves the rows and columns until nothing changes. Returns
+    the grid of decided cells, or None if a line has no solution."""
+    known = [[None] * width for r in range(height)]
+    dirty = [('row', r) for r in range(height)] + \
+            [('col', c) for c in range(width)]
+    queued = set(dirty)
+    while dirty:
+        line = dirty.pop(0)
+        queued.remove(line)
+        kind, i = line
+        if kind == 'row':
+            cells = [(i, c) for c in range(width)]
+            vals = across[i]
+        else:
+            cells = [(r, i) for r in range(height)]
+            vals = down[i]
+        new = line_solve(vals, [known[r][c] for r, c in cells])
+        if new is None:
+            return None
+        for (r, c), x in zip(cells, new):
+            if x is not None and known[r][c] is None:
+                known[r][c] = x
+                # the crossing line may be solved further
+                other = ('col', c) if kind == 'row' else ('row', r)
+                if other not in queued:
+                    dirty.append(other)
+                    queued.add(other)
+    return known
 
-def check(vals, row):
-    """vals: the clue numbers.  row: list of BoolVars."""
-    cum_count = IntVar(0)  # number of filled cells so far
-    prev_cell = BoolVar(False)
-    prev_group_end = BoolVar(False)
-    for cell in row:
-        cum_count += cell
-        # whether the cumulative count matches the end of a group.
-        group_end = reduce(lambda a,b: a|b,
-                           map(lambda x: cum_count == int(x), cumsum(vals)))
-        # if the prev cell is filled and current cell is not, this
-        # must be a group end.
-        require(cond(prev_cell & ~cell, group_end, True))
-        # if both prev and current cells are filled, this must not
-        # have been a group end.
-        require(cond(prev_cell & cell, ~prev_group_end, True))
-        prev_cell = cell
-        prev_group_end = group_end
-    # the total sum must match.
-    require(cum_count == int(sum(vals)))
+known = solve_lines()
+if known is not None:
+    decided = sum(x is not None for row in known for x in row)
+    gridstats.stats['propagation'] = {'fixed': decided,
+                                      'cells': width * height}
 
-for r in range(height):
-    check(across[r], grid[r])
-for c in range(width):
-    check(down[c], [grid[r][c] for r in range(height)])
+def show(soln):
+    for row in soln:
+        print ' '.join(map(lambda x: '#' if x else '`', row))
 
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    for row in grid:
-        print ' '.join(map(lambda x: '#' if x.value() else '`', row))
+if known is None:
+    # some line has no solution, so neither does the puzzle
+    print 'No solutions'
     print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
+    finish([], True)
+elif decided == width * height:
+    # line solving finds only what is true of every solution, so if
+    # it decides every cell, that is the only solution
+    solns = print_solutions(iter([known]), show)
+    print 'No other solutions'
+    print
+    finish(solns, True)
+else:
+    # clasp decides the rest, checking only the lines not yet solved
+    grid = [[BoolVar() if known[r][c] is None else BoolVar(known[r][c])
+             for c in range(width)] for r in range(height)]
+    line = lambda cells: [grid[r][c] if known[r][c] is None else known[r][c]
+                          for r, c in cells]
     for r in range(height):
-        for c in range(width):
-            x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+        if None in known[r]:
+            require(automaton.matches(across[r],
+                                      line([(r, c) for c in range(width)])))
+    for c in range(width):
+        if None in [known[r][c] for r in range(height)]:
+            require(automaton.matches(down[c],
+                                      line([(r, c) for r in range(height)])))
+    solve_loop(grid, show)
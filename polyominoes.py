@@ -3,7 +3,11 @@
 # http://tools.qhex.org/
 
 from claspy import *
+from gridsolve import *
 import sys
+import itertools
+import jsonout
+import exactcover
 
 def nrange(*dim_sizes):
     """Returns an iterator of all coordinates within the given dimensions."""
@@ -15,26 +19,51 @@ def nrange(*dim_sizes):
         for rest in apply(nrange, dim_sizes[1:]):
             yield (i,) + rest
 
+LAYER = '/'  # separates the layers of a shape in 3d mode
+
+jsonout.start()
 puz = sys.stdin.read().strip()
 lines = map(lambda line: line.rstrip(), puz.split('\n'))
-mode = lines[0]
-if mode not in ('translation', 'rotation', 'reflection'):
+words = lines[0].split()
+mode = words[0] if words else ''
+solid = words[1:] == ['3d']
+if mode not in ('translation', 'rotation', 'reflection') or \
+        words[1:] not in ([], ['3d']):
     print 'Error: mode not recognized.'
     print 'The first line must be one of:'
     print
     print 'translation'
     print 'rotation'
     print 'reflection'
+    print
+    print 'optionally followed by 3d, for solid pieces given as layers'
+    print 'separated by lines of ' + LAYER
     sys.exit()
+# each shape is a list of layers of rows of characters
 pieces = '\n'.join(lines[1:])
 pieces = filter(bool, pieces.split('\n\n'))
-pieces = map(lambda piece: map(list, piece.split('\n')), pieces)
+if solid:
+    pieces = map(lambda piece: [layer.strip('\n').split('\n') for layer in
+                                ('\n' + piece + '\n').split('\n' + LAYER + '\n')],
+                 pieces)
+else:
+    pieces = map(lambda piece: [piece.split('\n')], pieces)
+pieces = map(lambda piece: map(lambda layer: map(list, layer), piece), pieces)
 board = pieces[0]
 pieces = pieces[1:]
 
-board_area = sum(map(lambda x: x!=" ", reduce(lambda a,b: a+b, board)))
-piece_area = sum(map(lambda x: x!=" ", reduce(lambda a,b: a+b,
-                                              reduce(lambda a,b: a+b, pieces))))
+def cells(shape):
+    """Returns (z, r, c, character) for each cell of a shape."""
+    return [(z, r, c, shape[z][r][c]) for z in range(len(shape))
+            for r in range(len(shape[z])) for c in range(len(shape[z][r]))
+            if shape[z][r][c] != ' ']
+
+def shape_text(shape):
+    return ('\n' + LAYER + '\n').join('\n'.join(map(''.join, layer))
+                                    for layer in shape)
+
+board_area = len(cells(board))
+piece_area = sum(map(len, map(cells, pieces)))
 if piece_area > board_area:
     print 'solving with overlaps'
     print 'piece area', piece_area, 'board area', board_area
@@ -44,89 +73,156 @@ if piece_area < board_area:
     print 'piece area', piece_area, 'board area', board_area
     print
 
-height = len(board)
-width = max(map(len, board))
-
-piece_vars = []
-
-# For each piece, render the piece in every possible position, onto
-# two grids. grid_b is a grid of 0 or 1 indicating the presence of the
-# piece. This is used for computing constraints efficiently. grid_c is
-# a grid of whitespace with the characters of the piece rendered in
-# it, used for the final output.
-for piece in pieces:
-    positions = []  # list of (grid_b, grid_c)
-    for d_r, d_c, trans, flip1, flip2 in nrange(height, width, 2, 2, 2):
-        if mode == 'translation' and (trans or flip1 or flip2): continue
-        if mode == 'rotation' and trans + flip1 + flip2 not in (0, 2): continue
-        grid_b = [[0 for c in range(width)] for r in range(height)]
-        grid_c = [[None for c in range(width)] for r in range(height)]
-        invalid = False
-        for p_r in range(len(piece)):
-            for p_c in range(len(piece[p_r])):
-                if piece[p_r][p_c] != ' ':
-                    r,c = p_r,p_c
-                    # apply transformations
-                    if trans: r,c = c,r
-                    if flip1: r = -r
-                    if flip2: c = -c
-                    r += d_r
-                    c += d_c
-                    if r < 0 or r >= height or c < 0 or c >= width or \
-                            len(board[r]) <= c or board[r][c] == ' ':
-                        invalid = True
-                        break
-                    grid_b[r][c] = 1
-                    grid_c[r][c] = piece[p_r][p_c]
-            if invalid: break
-        if not invalid:
-            positions.append((grid_b, grid_c))
+depth = len(board)
+height = max(map(len, board))
+width = max(map(len, reduce(lambda a,b: a+b, board)))
+
+def on_board(z, r, c):
+    return z < depth and r < len(board[z]) and c < len(board[z][r]) and \
+        board[z][r][c] != ' '
+
+# Each placement of a piece is an integer bitmask of the squares it
+# covers, with bit (z*height + r)*width + c for square (z, r, c), along
+# with a tuple of (z, r, c, character) used for the output.
+
+def parity(perm):
+    return sum(perm[i] > perm[j] for i in range(len(perm))
+               for j in range(i + 1, len(perm))) % 2
+
+def orientations(piece):
+    """Returns each distinct way the piece can be turned, as a sorted
+    tuple of (z, r, c, character) moved to the corner. Flat pieces turn
+    in the plane, and solid pieces in 3d, giving up to 8 or 48 ways, or
+    4 or 24 without reflections."""
+    axes = 3 if solid else 2  # the last axes of (z, r, c) that move
+    result = set()
+    for perm in itertools.permutations(range(axes)):
+        for flips in nrange(*[2] * axes):
+            moved = list(perm) != range(axes) or any(flips)
+            if mode == 'translation' and moved: continue
+            if mode == 'rotation' and (parity(perm) + sum(flips)) % 2: continue
+            turned = []
+            for cell in cells(piece):
+                pos = list(cell[:3])
+                fixed, old = pos[:3-axes], pos[3-axes:]
+                new = [-old[perm[k]] if flips[k] else old[perm[k]]
+                       for k in range(axes)]
+                turned.append(tuple(fixed + new) + (cell[3],))
+            low = [min(cell[k] for cell in turned) for k in range(3)]
+            result.add(tuple(sorted((z - low[0], r - low[1], c - low[2], ch)
+                                    for z, r, c, ch in turned)))
+    return sorted(result)
+
+def piece_placements(shapes):
+    """Returns the placements of a piece on the board, given its
+    orientations."""
+    result = []
+    for shape in shapes:
+        for d_z, d_r, d_c in nrange(depth, height, width):
+            chars = tuple((z + d_z, r + d_r, c + d_c, ch)
+                          for z, r, c, ch in shape)
+            if all(on_board(z, r, c) for z, r, c, ch in chars):
+                result.append((sum(1 << ((z*height + r)*width + c)
+                                   for z, r, c, ch in chars), chars))
+    return result
+
+shapes = map(orientations, pieces)
+placements = []
+for piece, piece_shapes in zip(pieces, shapes):
+    positions = piece_placements(piece_shapes)
     if positions == []:
         print '\nno possible positions for piece:\n'
-        print join(piece, '\n', '')
+        print shape_text(piece)
         print '\nwithin shape:\n'
-        print join(board, '\n', '')
+        print shape_text(board)
         sys.exit()
-    # convert all lists to tuples
-    positions = map(lambda a: tuple(map(lambda b: tuple(map(tuple, b)), a)),
-                    positions)
-    positions = set(map(tuple, positions))
-    piece_vars.append(MultiVar(*positions))
+    placements.append(positions)
     print len(positions), 'placements for piece'
-
-# require each grid square to have one piece
 print
-for r in range(len(board)):
-    for c in range(len(board[r])):
-        if board[r][c] != ' ':
-            if piece_area < board_area:
-                require(at_most(1, [grid_b[r][c] for grid_b, grid_c in piece_vars]))
-            elif piece_area > board_area:
-                require(at_least(1, [grid_b[r][c] for grid_b, grid_c in piece_vars]))
-            else:
-                require(sum_bools(1, [grid_b[r][c] for grid_b, grid_c in piece_vars]))
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    soln = [['' if c < len(board[r]) else ' '
-             for c in range(width)] for r in range(height)]
-    for r, c, i in nrange(height, width, len(piece_vars)):
-        piece_grid_b, piece_grid_c = piece_vars[i].value()
-        if piece_grid_b[r][c]:
-            soln[r][c] += piece_grid_c[r][c]
-    max_w = 0
-    for r, c in nrange(height, width):
-        if soln[r][c] == '': soln[r][c] = board[r][c]
-        max_w = max(max_w, len(soln[r][c]))
-    print '\n'.join(map(lambda row: ' '.join(map(lambda x: x.center(max_w), row)), soln))
+
+# Pieces with the same orientations are interchangeable, so swapping
+# them in a solution gives the same solution. Each such piece is kept
+# at or after the placement of the identical piece before it.
+same_as = {}  # piece -> the previous identical piece
+last_seen = {}
+for i, piece_shapes in enumerate(shapes):
+    key = tuple(piece_shapes)
+    if key in last_seen:
+        same_as[i] = last_seen[key]
+    last_seen[key] = i
+if same_as:
+    print len(same_as), 'pieces identical to another piece'
+    print
+
+# the squares of the board, as bit numbers
+squares = [(z*height + r)*width + c for z, r, c, ch in cells(board)]
+
+dlx = exactcover.enabled()
+if dlx and piece_area > board_area:
+    print 'dancing links cannot solve with overlaps, using clasp'
     print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for piece_var in piece_vars:
-        x = x & (piece_var == piece_var.value())
-    require(~x)
+    dlx = False
+
+if dlx:
+    # each piece is placed once, covering each grid square once, or at
+    # most once when there is empty space
+    piece_columns = [('piece', i) for i in range(len(pieces))]
+    if piece_area < board_area:
+        cover = exactcover.ExactCover(piece_columns, squares)
+    else:
+        cover = exactcover.ExactCover(piece_columns + squares)
+    for i, positions in enumerate(placements):
+        for k, (mask, chars) in enumerate(positions):
+            cover.add_row((i, k), [('piece', i)] +
+                          [b for b in squares if mask >> b & 1])
+else:
+    piece_vars = map(lambda positions: MultiVar(*positions), placements)
+
+    # require each grid square to have one piece
+    for b in squares:
+        covering = [at_least(1, [piece_vars[i] == position
+                                 for position in positions
+                                 if position[0] >> b & 1])
+                    for i, positions in enumerate(placements)]
+        if piece_area < board_area:
+            require(at_most(1, covering))
+        elif piece_area > board_area:
+            require(at_least(1, covering))
+        else:
+            require(sum_bools(1, covering))
+
+    # identical pieces have the same placements, in the same order
+    for i, j in same_as.items():
+        earlier = BoolVar(False)  # piece j is at or before this placement
+        for position in placements[i]:
+            earlier = earlier | (piece_vars[j] == position)
+            require(~(piece_vars[i] == position) | earlier)
+
+def decode(rows):
+    """The placement of each piece in a dancing links solution, or None
+    if identical pieces are out of order."""
+    index = dict(rows)
+    if any(index[i] < index[j] for i, j in same_as.items()):
+        return None
+    return [placements[i][index[i]] for i in range(len(pieces))]
+
+def show(soln):
+    soln_grid = [[['' if r < len(board[z]) and c < len(board[z][r]) else ' '
+                   for c in range(width)] for r in range(height)]
+                 for z in range(depth)]
+    for mask, chars in soln:
+        for z, r, c, ch in chars:
+            soln_grid[z][r][c] += ch
+    max_w = 0
+    for z, r, c in nrange(depth, height, width):
+        if soln_grid[z][r][c] == '': soln_grid[z][r][c] = board[z][r][c]
+        max_w = max(max_w, len(soln_grid[z][r][c]))
+    print ('\n' + LAYER + '\n').join(
+        '\n'.join(map(lambda row: ' '.join(map(lambda x: x.center(max_w), row)),
+                      layer))
+        for layer in soln_grid)
+
+if dlx:
+    solve_cover(cover, decode, show)
+else:
+    solve_loop(piece_vars, show)
@@ -4,59 +4,96 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
+import exactcover
 
-max_val = max(map(lambda x: 0 if x == '`' else int(x),
-                  reduce(lambda a,b: a+b, puz)))
-set_max_val(width ** 3)
-
-groups = sum(map(lambda x: x != '`', reduce(lambda a,b: a+b, puz)))
-group = [[IntVar(0,groups-1) for c in range(width)] for r in range(height)]
-print groups, "groups"
-group_id = 0
-for r,c in nrange(height, width):
-    if puz[r][c] == '`': continue
-    require(group[r][c] == group_id)
-    # all rectangles
-    rect_ok = BoolVar(False)
-    for r1,c1,r2,c2 in nrange(height, width, height, width):
-        if r2 < r1 or c2 < c1: continue
-        if r1 > r or c1 > c: continue
-        if r2 < r or c2 < c: continue
-        if (r2 - r1 + 1) * (c2 - c1 + 1) != int(puz[r][c]): continue
-        group_valid = BoolVar(True)
-        # all cells in rectangle
-        for r3,c3 in nrange(height, width):
-            if r3 >= r1 and r3 <= r2 and c3 >= c1 and c3 <= c2:
-                group_valid = group_valid & (group[r3][c3] == group_id)
-            else:
-                group_valid = group_valid & (group[r3][c3] != group_id)
-        rect_ok = rect_ok | group_valid
-    require(rect_ok, str((r,c)))
-    group_id += 1
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
+def rectangles(puz):
+    """Returns (group_id, (r1, c1, r2, c2), cells) for each rectangle a
+    clue's group may be: of the clue's area, holding no other clue."""
+    height, width = len(puz), len(puz[0])
+    clues = [(r,c) for r,c in nrange(height, width) if puz[r][c] != '`']
+    print len(clues), "groups"
+    result = []
+    for group_id, (r,c) in enumerate(clues):
+        area = int(puz[r][c])
+        for r1,c1 in nrange(r+1, c+1):
+            for h in range(r-r1+1, height-r1+1):
+                w = area / h
+                if h * w != area or c1 + w <= c or c1 + w > width: continue
+                r2, c2 = r1 + h - 1, c1 + w - 1
+                cells = [(r1+i,c1+j) for i,j in nrange(h, w)]
+                if any(puz[r3][c3] != '`' for r3,c3 in cells
+                       if (r3,c3) != (r,c)): continue
+                result.append((group_id, (r1, c1, r2, c2), cells))
+    return result
+
+def build(puz):
+    """The puzzle as an exact cover in clasp: a BoolVar for each
+    rectangle, with one for each clue and one covering each cell."""
+    height, width = len(puz), len(puz[0])
+    rects = rectangles(puz)
+    chosen = [BoolVar() for rect in rects]
+    clues = [(r,c) for r,c in nrange(height, width) if puz[r][c] != '`']
+
+    for group_id, clue in enumerate(clues):
+        require(sum_bools(1, [x for x, (g, corners, cells) in zip(chosen, rects)
+                              if g == group_id]), str(clue))
+
+    # the rectangles covering each cell, by group
+    covering = [[{} for c in range(width)] for r in range(height)]
+    for x, (group_id, corners, cells) in zip(chosen, rects):
+        for r,c in cells:
+            covering[r][c].setdefault(group_id, []).append(x)
+
+    group = [[None for c in range(width)] for r in range(height)]
+    for r,c in nrange(height, width):
+        by_group = covering[r][c]
+        require(sum_bools(1, reduce(lambda a,b: a+b, by_group.values(), [])))
+        # with no rectangles, the cell can not be covered anyway
+        group[r][c] = MultiVar(*(sorted(by_group) or [0]))
+        for group_id, xs in by_group.items():
+            require((group[r][c] == group_id) == at_least(1, xs))
+
+    return group
+
+def cover(puz):
+    """The puzzle as an exact cover: a row for each rectangle of the
+    right area holding just one clue, covering its cells."""
+    height, width = len(puz), len(puz[0])
+    x = exactcover.ExactCover(list(nrange(height, width)))
+    for group_id, corners, cells in rectangles(puz):
+        x.add_row((group_id,) + corners, cells)
+    return x
+
+def decode(puz, rows):
+    group = [[None for c in range(len(puz[0]))] for r in range(len(puz))]
+    for group_id, r1, c1, r2, c2 in rows:
+        for r,c in nrange(r2-r1+1, c2-c1+1):
+            group[r1+r][c1+c] = group_id
+    return group
+
+def show(puz, soln):
+    height, width = len(puz), len(puz[0])
     x = [['' for c in range(width*2-1)] for r in range(height*2-1)]
     for r,c in nrange(height, width):
         x[r*2][c*2] = puz[r][c]
     for r,c in nrange(height-1, width):
-        if group[r][c].value() != group[r+1][c].value():
+        if soln[r][c] != soln[r+1][c]:
             x[r*2+1][c*2] = '--'
             if c < width - 1: x[r*2+1][c*2+1] = '--'
     for r,c in nrange(height, width-1):
-        if group[r][c].value() != group[r][c+1].value():
+        if soln[r][c] != soln[r][c+1]:
             x[r*2][c*2+1] = x[r*2][c*2+1][:1] + '|'
             if r < height - 1: x[r*2+1][c*2+1] = x[r*2+1][c*2+1][:1] + '|'
     for row in x:
         print ''.join(map(lambda a: a.rjust(2), row))
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for r,c in nrange(height, width):
-        x = x & (group[r][c] == group[r][c].value())
-    require(~x)
+
+def solve_grid(puz):
+    if exactcover.enabled():
+        solve_cover(cover(puz), lambda rows: decode(puz, rows),
+                    lambda soln: show(puz, soln))
+    else:
+        solve_puzzle(puz, build, show, Symmetry(ALL))
+
+if __name__ == '__main__':
+    run(solve_grid)
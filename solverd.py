@@ -0,0 +1,271 @@
+#!/usr/bin/python -u
+#
+# http://tools.qhex.org/
+#
+# A daemon that keeps claspy and the grid solvers loaded, so requests
+# don't pay for starting python and importing them. Run it with no
+# arguments. gridpuzzle and format send their requests here when it
+# is running, and start the scripts themselves otherwise.
+#
+# Each request is served by a forked worker in its own process group,
+# so it starts from a fresh claspy and can be killed along with clasp.
+# The client sends "<tool> <length> [argument ...]\n" followed by the
+# input. The reply is a series of frames "o <length>\n<data>" for
+# stdout and "e <length>\n<data>" for stderr, ending with
+# "x <exit status>\n".
+# Closing the connection early kills the worker. Only the user running
+# the daemon can connect to its socket.
+
+import sys
+import os
+import errno
+import socket
+import signal
+import threading
+import traceback
+import runpy
+import gridstats
+import jsonout
+from StringIO import StringIO
+
+SOCKET = os.environ.get('QHEX_SOLVERD', '/tmp/qhex-solverd.sock')
+MAX_WORKERS = 4
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+solvers = '''\
+maysu
+sudoku
+lightsout
+thermometers
+kakuro
+fillapix
+minesweeper
+hitori
+nurikabe
+tapa
+hashiwokakero
+numberlink
+shikaku
+fillomino'''
+solvers = solvers.split('\n')
+
+# the other tools, which are run as scripts
+scripts = '''\
+paintbynumbers
+polyominoes
+sudokubatch
+caesarshift
+encoding
+extraction
+histogram
+wordplay
+wordsearch'''
+scripts = scripts.split('\n')
+
+# everything a request may name
+tools = solvers + scripts
+
+################################################################################
+# client
+
+class Channel(object):
+    def __init__(self, request, name):
+        self.request = request
+        self.name = name
+    def readline(self):
+        return self.request.readline(self.name)
+    def read(self):
+        return self.request.read(self.name)
+
+class Request(object):
+    """A request in progress. Has the parts of the Popen interface that
+    gridpuzzle and format use: stdout.readline(), stderr.read(), wait()
+    and kill()."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.f = sock.makefile('rb')
+        self.data = {'o': '', 'e': ''}
+        self.status = None
+        self.stdout = Channel(self, 'o')
+        self.stderr = Channel(self, 'e')
+
+    def read_frame(self):
+        """Reads one frame. Returns False at the end of the reply."""
+        if self.status is not None:
+            return False
+        try:
+            header = self.f.readline().split()
+        except (socket.error, ValueError):
+            header = None  # killed from another thread
+        if not header:  # the worker was killed
+            self.status = -signal.SIGKILL
+            return False
+        if header[0] == 'x':
+            self.status = int(header[1])
+            return False
+        self.data[header[0]] += self.f.read(int(header[1]))
+        return True
+
+    def readline(self, name):
+        while '\n' not in self.data[name] and self.read_frame():
+            pass
+        data = self.data[name]
+        end = data.find('\n') + 1 or len(data)
+        self.data[name] = data[end:]
+        return data[:end]
+
+    def read(self, name):
+        while self.read_frame():
+            pass
+        data = self.data[name]
+        self.data[name] = ''
+        return data
+
+    def wait(self):
+        while self.read_frame():
+            pass
+        return self.status
+
+    def kill(self):
+        if self.status is None:
+            self.status = -signal.SIGKILL
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass  # already closed
+        self.f.close()
+        self.sock.close()
+
+def request(tool, input_str, args=()):
+    """Sends a request to the daemon. Returns None if it isn't running."""
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.connect(SOCKET)
+    except socket.error:
+        sock.close()
+        return None
+    sock.sendall('%s %d%s\n%s' % (tool, len(input_str),
+                                   ''.join(' ' + arg for arg in args),
+                                   input_str))
+    return Request(sock)
+
+################################################################################
+# server
+
+class Frames(object):
+    """A file that sends what is written to it as frames, a line at a
+    time."""
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.buf = ''
+    def write(self, s):
+        self.buf += s
+        if '\n' in self.buf:
+            self.flush()
+    def flush(self):
+        if self.buf:
+            self.conn.sendall('%s %d\n%s' % (self.name, len(self.buf), self.buf))
+            self.buf = ''
+
+def watch(conn):
+    """Kills the worker and clasp if the client hangs up."""
+    try:
+        conn.recv(1)
+    except socket.error:
+        pass
+    os.killpg(0, signal.SIGKILL)
+
+def serve(conn, modules):
+    """Runs one request in a forked worker."""
+    os.setsid()
+    f = conn.makefile('rb')
+    header = f.readline().split()
+    tool, length, args = header[0], header[1], header[2:]
+    sys.stdin = StringIO(f.read(int(length)))
+    watcher = threading.Thread(target=watch, args=(conn,))
+    watcher.daemon = True
+    watcher.start()
+    sys.stdout = Frames(conn, 'o')
+    sys.stderr = Frames(conn, 'e')
+    status = 0
+    path = os.path.join(here, tool + '.py')
+    sys.argv = [path] + args
+    gridstats.reset()
+    try:
+        if tool in modules:
+            modules[tool].run(modules[tool].solve_grid)
+        elif tool in scripts:
+            runpy.run_path(path, run_name='__main__')
+        else:
+            print >>sys.stderr, 'unknown tool:', tool
+            status = 1
+    except SystemExit, e:
+        if isinstance(e.code, int):
+            status = e.code
+        elif e.code is not None:
+            print >>sys.stderr, e.code
+            status = 1
+    except:
+        traceback.print_exc()
+        jsonout.error('exception',
+                      traceback.format_exc().strip().split('\n')[-1])
+        status = 1
+    jsonout.finish()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    conn.sendall('x %d\n' % status)
+
+def main():
+    sys.path.insert(0, here)
+    modules = dict((name, __import__(name)) for name in solvers)
+    if os.path.exists(SOCKET):
+        os.remove(SOCKET)
+    server = socket.socket(socket.AF_UNIX)
+    server.bind(SOCKET)
+    os.chmod(SOCKET, 0600)  # before listen(), so no one else can connect
+    server.listen(16)
+    print 'listening on', SOCKET
+    workers = set()
+    finished = []  # workers reaped but not yet taken out of workers
+    def reap(signum, frame):
+        """Reaps workers as they exit, so none are left as zombies while
+        the daemon is idle."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                return  # no workers left
+            if pid == 0: return
+            finished.append(pid)
+    signal.signal(signal.SIGCHLD, reap)
+    while True:
+        try:
+            conn, addr = server.accept()
+        except socket.error, e:
+            if e.errno == errno.EINTR: continue  # a worker finished
+            raise
+        while True:
+            while finished:
+                workers.discard(finished.pop())
+            if len(workers) < MAX_WORKERS: break
+            try:
+                finished.append(os.wait()[0])
+            except OSError:
+                pass  # reaped by the handler
+        pid = os.fork()
+        if pid == 0:
+            # the worker waits for clasp itself
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            server.close()
+            try:
+                serve(conn, modules)
+            except:
+                pass  # the client went away
+            os._exit(0)
+        conn.close()
+        workers.add(pid)
+
+if __name__ == '__main__':
+    main()
@@ -4,41 +4,186 @@
 
 from claspy import *
 from gridinput import *
+from gridsolve import *
+import gridstats
+import exactcover
 
-assert height == 9
-assert width == 9
-
-vals = set(reduce(lambda a,b: a+b, puz)) - set(['`'])
-if len(vals) > 9:
-    print 'Too many distinct symbols:', ' '.join(list(vals))
-    sys.exit()
-for i in range(1,10):
-    if len(vals) < 9:
-        vals.add(str(i))
-grid = tmap(lambda x: MultiVar(*vals) if x == '`' else MultiVar(x), puz)
-
-# for regular sudoku, this is faster
-# grid = tmap(lambda x: IntVar(1,9) if x == '`' else IntVar(int(x)), puz)
-
-for r in range(9):
-    require_all_diff(grid[r])
-for c in range(9):
-    require_all_diff([grid[r][c] for r in range(9)])
-for r in range(0,9,3):
-    for c in range(0,9,3):
-        require_all_diff([grid[r+i][c+j] for (i,j) in nrange(3,3)])
-
-soln_count = 0
-while solve():
-    soln_count += 1
-    print 'Solution %d:' % soln_count
-    p(grid)
-    print
-    if soln_count >= 10:
-        print 'Too many solutions...'
-        break
-    print 'Checking for other solutions'
-    x = BoolVar(True)
-    for r,c in nrange(9,9):
-        x = x & (grid[r][c] == grid[r][c].value())
-    require(~x)
+SYMBOLS = '123456789ABCDEFGHIJKLMNOP'
+
+def box_size(n):
+    """The size of the boxes of an n x n sudoku, or None."""
+    b = int(round(n ** 0.5))
+    return b if b > 1 and b * b == n else None
+
+def symbols(puz):
+    """The given symbols, plus defaults to make one for each row."""
+    n = len(puz)
+    vals = set(reduce(lambda a,b: a+b, puz)) - set(['`'])
+    if all(x.isdigit() for x in vals):
+        defaults = map(str, range(1, n+1))
+    else:
+        defaults = SYMBOLS
+    for x in defaults:
+        if len(vals) < n:
+            vals.add(x)
+    return vals
+
+unit_cache = {}  # n -> (rows, cols, boxes, peers, box_of)
+
+def units(n):
+    """The rows, columns and boxes of an n x n sudoku, as lists of cell
+    numbers r*n + c, with the peers of each cell."""
+    if n in unit_cache:
+        return unit_cache[n]
+    b = box_size(n)
+    rows = [[r*n + c for c in range(n)] for r in range(n)]
+    cols = [[r*n + c for r in range(n)] for c in range(n)]
+    boxes = [[(br*b + i)*n + bc*b + j for i, j in nrange(b, b)]
+             for br, bc in nrange(b, b)]
+    peers = [set() for i in range(n*n)]
+    box_of = [None] * (n*n)
+    for unit in rows + cols + boxes:
+        for i in unit:
+            peers[i].update(unit)
+    for k, box in enumerate(boxes):
+        for i in box:
+            box_of[i] = k
+    for i in range(n*n):
+        peers[i].remove(i)
+    unit_cache[n] = (rows, cols, boxes, peers, box_of)
+    return unit_cache[n]
+
+def propagate(puz, vals):
+    """Narrows the candidates of each cell, kept as bitmasks over vals,
+    with naked singles, hidden singles and box/line interactions.
+    Returns the bitmasks, or None if the givens contradict."""
+    n = len(puz)
+    rows, cols, boxes, peers, box_of = units(n)
+    full = (1 << len(vals)) - 1
+    bits = [1 << k for k in range(len(vals))]
+    cand = [full if x == '`' else 1 << vals.index(x)
+            for x in reduce(lambda a,b: a+b, puz)]
+    def eliminate(bit, cells):
+        """Removes bit from the cells. Returns whether any changed."""
+        changed = False
+        for i in cells:
+            if cand[i] & bit:
+                cand[i] &= ~bit
+                changed = True
+        return changed
+    changed = True
+    while changed:
+        changed = False
+        # naked singles: a cell's only candidate is ruled out of its peers
+        for i in range(n*n):
+            if cand[i] & (cand[i] - 1) == 0:
+                changed |= eliminate(cand[i], peers[i])
+        if not all(cand):
+            return None
+        # hidden singles: a symbol with one place left in a unit goes there
+        for unit in rows + cols + boxes:
+            for bit in bits:
+                cells = [i for i in unit if cand[i] & bit]
+                if not cells:
+                    return None
+                if len(cells) == 1 and cand[cells[0]] != bit:
+                    cand[cells[0]] = bit
+                    changed = True
+        # box/line: a symbol confined to one line of a box is ruled out
+        # of the rest of the line, and one confined to one box of a line
+        # is ruled out of the rest of the box
+        for box in boxes:
+            for bit in bits:
+                cells = [i for i in box if cand[i] & bit]
+                for lines, line_of in ((rows, lambda i: i // n),
+                                       (cols, lambda i: i % n)):
+                    found = set(map(line_of, cells))
+                    if len(found) == 1:
+                        line = lines[found.pop()]
+                        changed |= eliminate(bit, set(line) - set(box))
+        for line in rows + cols:
+            for bit in bits:
+                found = set(box_of[i] for i in line if cand[i] & bit)
+                if len(found) == 1:
+                    box = boxes[found.pop()]
+                    changed |= eliminate(bit, set(box) - set(line))
+    return cand
+
+def domains(puz):
+    """Checks the size of the grid, and returns the symbols that each
+    cell may hold after propagation."""
+    height, width = len(puz), len(puz[0])
+
+    if width != height or box_size(height) is None:
+        print 'Sudoku must be square with a square number of rows,'
+        print 'such as 4x4, 9x9, 16x16 or 25x25.'
+        sys.exit()
+    n = height
+
+    vals = sorted(symbols(puz))
+    if len(vals) > n:
+        print 'Too many distinct symbols:', ' '.join(list(vals))
+        sys.exit()
+
+    cand = propagate(puz, vals)
+    if cand is None:  # contradictory givens, left for the solver to report
+        return tmap(lambda x: vals if x == '`' else [x], puz)
+    result = [[[x for k, x in enumerate(vals) if cand[r*n + c] >> k & 1]
+               for c in range(n)] for r in range(n)]
+    cells = reduce(lambda a,b: a+b, result)
+    gridstats.stats['propagation'] = {
+        'fixed': sum(len(d) == 1 for d in cells),
+        'candidates': sum(map(len, cells))}
+    return result
+
+def build(puz):
+    grid = tmap(lambda domain: MultiVar(*domain), domains(puz))
+    n, b = len(puz), box_size(len(puz))
+
+    # for regular sudoku, this is faster
+    # grid = tmap(lambda x: IntVar(1,9) if x == '`' else IntVar(int(x)), puz)
+
+    for r in range(n):
+        require_all_diff(grid[r])
+    for c in range(n):
+        require_all_diff([grid[r][c] for r in range(n)])
+    for r in range(0,n,b):
+        for c in range(0,n,b):
+            require_all_diff([grid[r+i][c+j] for (i,j) in nrange(b,b)])
+
+    return grid
+
+def cover(puz):
+    """The sudoku as an exact cover: a row for each symbol each cell may
+    hold, covering the cell and the symbol in its row, column and box."""
+    cells = domains(puz)
+    n, b = len(puz), box_size(len(puz))
+    vals = sorted(symbols(puz))
+    x = exactcover.ExactCover(
+        [('cell', r, c) for r, c in nrange(n, n)] +
+        [(unit, i, v) for unit in ('row', 'col', 'box')
+         for i in range(n) for v in vals])
+    for r, c in nrange(n, n):
+        for v in cells[r][c]:
+            x.add_row((r, c, v), [('cell', r, c), ('row', r, v), ('col', c, v),
+                                  ('box', r // b * b + c // b, v)])
+    return x
+
+def decode(puz, rows):
+    soln = [[None] * len(puz) for r in range(len(puz))]
+    for r, c, v in rows:
+        soln[r][c] = v
+    return soln
+
+def show(puz, soln):
+    p(soln)
+
+def solve_grid(puz):
+    if exactcover.enabled():
+        solve_cover(cover(puz), lambda rows: decode(puz, rows),
+                    lambda soln: show(puz, soln))
+    else:
+        solve_puzzle(puz, build, show, Symmetry(ALL, symbols=symbols))
+
+if __name__ == '__main__':
+    run(solve_grid)
@@ -0,0 +1,151 @@
+#!/usr/bin/python -u
+#
+# http://tools.qhex.org/
+#
+# Solves a page of 9x9 sudokus, separated by lines of ---, all at once.
+# The candidates of every grid are held as bitmasks in one numpy array
+# of shape (grids, 81), and naked and hidden singles are applied to all
+# of them together. Grids left open are split on a cell with the fewest
+# candidates, and the halves are propagated again, stopping at as many
+# solutions per grid as sudoku.py lists. Only a grid that needs too many branches, or that
+# isn't a standard sudoku, goes to sudoku.py's claspy model.
+
+import sys
+import time
+import numpy as np
+import gridstats
+import jsonout
+from gridinput import parse_grid, split_grids
+from gridsolve import print_solutions, finish, solve_one, MAX_SOLUTIONS
+import sudoku
+
+CHUNK = 500       # grids searched together
+MAX_ROWS = 20000  # candidate grids held at once while branching
+
+BITS = (1 << np.arange(9)).astype(np.uint16)
+POP = np.array([bin(x).count('1') for x in range(512)], dtype=np.uint8)
+DIGIT = np.zeros(512, dtype=np.int8)
+DIGIT[BITS] = np.arange(9)
+
+UNITS = np.array([[r*9 + c for c in range(9)] for r in range(9)] +
+                 [[r*9 + c for r in range(9)] for c in range(9)] +
+                 [[(br*3 + i)*9 + bc*3 + j for i in range(3) for j in range(3)]
+                  for br in range(3) for bc in range(3)])
+CELL_UNITS = np.array([[u for u in range(27) if i in UNITS[u]]
+                       for i in range(81)])
+PEERS = np.array([sorted(set(UNITS[CELL_UNITS[i]].flat) - set([i]))
+                  for i in range(81)])
+
+def standard(puz):
+    """Returns the symbols of a 9x9 sudoku, or None for other grids."""
+    if not puz or len(puz) != 9 or any(len(row) != 9 for row in puz):
+        return None
+    vals = sorted(sudoku.symbols(puz))
+    return vals if len(vals) == 9 else None
+
+def candidates(puz, vals):
+    return [511 if x == '`' else 1 << vals.index(x)
+            for x in reduce(lambda a,b: a+b, puz)]
+
+def propagate(cand):
+    """Applies naked and hidden singles to each row of cand until
+    nothing changes. Returns the narrowed candidates, and which rows
+    have no solution."""
+    while True:
+        before = cand
+        # naked singles: a fixed cell's digit is ruled out of its peers
+        fixed = np.where(POP[cand] == 1, cand, 0).astype(np.uint16)
+        cand = cand & ~np.bitwise_or.reduce(fixed[:, PEERS], axis=2)
+        # hidden singles: a digit with one place left in a unit goes there
+        has = (cand[:, UNITS][..., None] & BITS) != 0
+        count = has.sum(axis=2)
+        once = ((count == 1) * BITS).sum(axis=2).astype(np.uint16)
+        hidden = np.bitwise_or.reduce(once[:, CELL_UNITS], axis=2) & cand
+        cand = np.where(hidden != 0, hidden, cand).astype(np.uint16)
+        cand[POP[hidden] > 1] = 0  # two digits need the same cell
+        dead = (cand == 0).any(axis=1) | (count == 0).any(axis=(1, 2))
+        if np.array_equal(cand, before) or dead.all():
+            return cand, dead
+
+def search(cand, limit=MAX_SOLUTIONS):
+    """Finds up to limit solutions of each grid in cand. Returns the
+    solutions of each grid, the grids that needed branching, and the
+    grids given up on."""
+    origin = np.arange(len(cand))
+    solutions = [[] for i in range(len(cand))]
+    branched = set()
+    while len(cand):
+        cand, dead = propagate(cand)
+        solved = ~dead & (POP[cand] == 1).all(axis=1)
+        for i in np.nonzero(solved)[0]:
+            if len(solutions[origin[i]]) < limit:
+                solutions[origin[i]].append(DIGIT[cand[i]])
+        done = np.array([len(solutions[o]) >= limit for o in origin], dtype=bool)
+        keep = ~dead & ~solved & ~done
+        cand, origin = cand[keep], origin[keep]
+        if 2 * len(cand) > MAX_ROWS:
+            return solutions, branched, set(origin)
+        # branch on the lowest candidate of a cell with the fewest
+        pop = np.where(POP[cand] > 1, POP[cand], 10)
+        rows, cells = np.arange(len(cand)), pop.argmin(axis=1)
+        value = cand[rows, cells]
+        low = value & (~value + 1)
+        left, right = cand.copy(), cand.copy()
+        left[rows, cells] = low
+        right[rows, cells] = value & ~low
+        cand = np.concatenate([left, right])
+        origin = np.concatenate([origin, origin])
+        branched.update(origin)
+    return solutions, branched, set()
+
+def show_grid(n, puz, vals, solns, method):
+    """Prints the solutions of the n'th grid as sudoku.py would."""
+    gridstats.reset()
+    gridstats.stats['height'], gridstats.stats['width'] = 9, 9
+    gridstats.stats['method'] = method
+    print 'Grid %d:' % n
+    jsonout.document(n)
+    solns = [[[vals[d] for d in soln[r*9:r*9 + 9]] for r in range(9)]
+             for soln in solns]
+    print_solutions(iter(solns), lambda soln: sudoku.show(puz, soln))
+    finish(solns, True)
+    jsonout.end()
+    print
+
+def main():
+    jsonout.start()
+    grids = split_grids(sys.stdin.read())
+    start = time.time()
+    puzzles = [parse_grid(text) for text in grids]
+    symbols = map(standard, puzzles)
+    batch = [i for i, vals in enumerate(symbols) if vals]
+    solutions, branched, unresolved = [], set(), set()
+    for k in range(0, len(batch), CHUNK):
+        cand = np.array([candidates(puzzles[i], symbols[i])
+                         for i in batch[k:k + CHUNK]], dtype=np.uint16)
+        s, b, u = search(cand)
+        solutions += s
+        branched.update(k + x for x in b)
+        unresolved.update(k + x for x in u)
+    counts = {'propagation': 0, 'search': 0, 'clasp': 0}
+    found = dict((i, k) for k, i in enumerate(batch))
+    for i, text in enumerate(grids):
+        k = found.get(i)
+        if k is None or k in unresolved:
+            solve_one(sudoku.solve_grid, i + 1, text)
+            counts['clasp'] += 1
+        else:
+            method = 'search' if k in branched else 'propagation'
+            show_grid(i + 1, puzzles[i], symbols[i], solutions[k], method)
+            counts[method] += 1
+    seconds = time.time() - start
+    jsonout.document(None)
+    print 'Solved %d grids in %.2f seconds, %.1f per second' % \
+        (len(grids), seconds, len(grids) / seconds)
+    print '%(propagation)d by propagation, %(search)d by search, ' \
+        '%(clasp)d by clasp' % counts
+    jsonout.result('ok', grids=len(grids), seconds=seconds,
+                   per_second=len(grids) / seconds, **counts)
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@
 
 import sys
 import os
+import jsonout
 import re
 from math import factorial
 import itertools
@@ -13,6 +14,7 @@ from time import time
 # location relative to program
 SORTED_DICT = '../dict/sortedwords.txt'
 
+jsonout.start()
 input = sys.stdin.read().strip()
 
 # each filter function yields a set of regex patterns
@@ -315,14 +317,18 @@ else:  # regular search
     results = single_search(input.split('\n'), False)
 
 count = 0
+found = []
 for result in results:
     if result is None: continue
     print result
+    found.append(result)
     count += 1
     if count > DISPLAY_LIMIT:
         print '...\n\n(too many results)'
+        jsonout.result('ok', results=found, more=True)
         sys.exit()
 
 if count == 0:
     print 'no results found'
+jsonout.result('ok', results=found, more=False)
 
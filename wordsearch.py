@@ -5,7 +5,9 @@
 import sys
 from copy import deepcopy
 import dictionary
+import jsonout
 
+jsonout.start()
 puz = sys.stdin.read().strip()
 puz, sep, given_words = puz.partition('\n\n')
 puz = filter(lambda x: x not in ' \t', puz)
@@ -62,3 +64,7 @@ for score, word, s in words[:150]:
   print word.ljust(max_len), s
 if len(words) > 150:
   print '...'
+jsonout.result('ok', grid=puz_blanked, filled=puz_filled,
+               words=[{'word': word, 'position': s, 'score': score}
+                      for score, word, s in words[:150]],
+               more=len(words) > 150)